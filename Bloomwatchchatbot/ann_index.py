@@ -0,0 +1,317 @@
+"""
+ann_index.py
+Approximate nearest-neighbour indexes for the compact vector store
+IVF (pure numpy) or HNSW (hnswlib), built from the store's own vectors,
+with query-time recall/latency knobs and a recall-vs-latency benchmark
+"""
+
+import json
+import math
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from compact_store import _train_kmeans, swap_directory
+
+
+class IVFIndex:
+    """
+    Inverted-file index: every row is filed under its nearest coarse
+    centroid and a query only scans the nprobe closest lists
+
+    Layout of the index folder:
+        ann.json          - kind, count, build and query parameters
+        ivf_centroids.npy - (nlist, dim) float32 coarse centroids
+        ivf_rows.npy      - int64 row numbers grouped by list
+        ivf_offsets.npy   - (nlist + 1) start of each list in ivf_rows
+    """
+
+    kind = "ivf"
+
+    def __init__(self, path: str, vectors: np.ndarray, nprobe: Optional[int] = None):
+        """
+        Open a persisted index
+
+        Args:
+            path: Index folder written by IVFIndex.build
+            vectors: The store's (count, dim) vectors the rows refer to
+            nprobe: Lists scanned per query (more = higher recall, slower)
+        """
+        self.path = Path(path)
+        self.vectors = vectors
+        with open(self.path / "ann.json", "r", encoding="utf-8") as f:
+            self.info = json.load(f)
+        self.centroids = np.load(self.path / "ivf_centroids.npy")
+        self.rows = np.load(self.path / "ivf_rows.npy", mmap_mode="r")
+        self.offsets = np.load(self.path / "ivf_offsets.npy")
+        self.nprobe = nprobe or self.info["nprobe"]
+
+    def set_params(self, nprobe: Optional[int] = None, **unused):
+        if nprobe:
+            self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, path: str, vectors: np.ndarray, nlist: Optional[int] = None,
+              nprobe: int = 8, sample_size: int = 100_000, iterations: int = 10,
+              block_size: int = 65536) -> "IVFIndex":
+        """
+        Train the coarse quantizer on a sample and file every row
+
+        Args:
+            path: Destination folder
+            vectors: (count, dim) vectors, e.g. the store's float16 memmap
+            nlist: Number of lists (default 4 * sqrt(count))
+            nprobe: Default lists scanned per query
+            sample_size: Rows used to train the centroids
+            iterations: k-means iterations
+        """
+        count = len(vectors)
+        nlist = min(nlist or max(1, int(4 * math.sqrt(count))), count)
+        rng = np.random.default_rng(42)
+        sample_rows = (np.sort(rng.choice(count, sample_size, replace=False))
+                       if count > sample_size else np.arange(count))
+        centroids = _train_kmeans(np.asarray(vectors[sample_rows], dtype=np.float32),
+                                  nlist, iterations=iterations)
+
+        assignment = np.empty(count, dtype=np.int32)
+        centroid_sq = (centroids ** 2).sum(axis=1)
+        for start in range(0, count, block_size):
+            block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+            assignment[start:start + block_size] = (centroid_sq - 2 * block @ centroids.T).argmin(axis=1)
+
+        rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=len(centroids)))
+
+        tmp_path = _fresh_tmp(path)
+        np.save(tmp_path / "ivf_centroids.npy", centroids)
+        np.save(tmp_path / "ivf_rows.npy", rows)
+        np.save(tmp_path / "ivf_offsets.npy", offsets)
+        _write_info(tmp_path, {"kind": cls.kind, "count": int(count), "nlist": int(len(centroids)),
+                               "nprobe": int(nprobe)})
+        swap_directory(tmp_path, Path(path))
+        return cls(path, vectors)
+
+    def search(self, queries: np.ndarray, n: int,
+               mask: Optional[np.ndarray] = None) -> Optional[List[np.ndarray]]:
+        """
+        Approximate top-n rows per query
+
+        Returns:
+            One array of row numbers per query, best first, or None when the
+            probed lists hold fewer than n rows passing the filter for some
+            query (the caller then scans the partition exactly, as for HNSW)
+        """
+        nprobe = min(self.nprobe, len(self.centroids))
+        distances = (self.centroids ** 2).sum(axis=1) - 2 * queries @ self.centroids.T
+        probes = np.argpartition(distances, nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for query, lists in zip(queries, probes):
+            rows = np.concatenate([self.rows[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+            if mask is not None:
+                rows = rows[mask[rows]]
+            if len(rows) < n:
+                return None
+            rows.sort()
+            scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+            top = (np.argpartition(-scores, n - 1)[:n] if len(rows) > n
+                   else np.arange(len(rows)))
+            results.append(rows[top[np.argsort(-scores[top])]])
+        return results
+
+
+class HNSWIndex:
+    """
+    Hierarchical navigable small-world graph (hnswlib, inner-product space)
+
+    Layout of the index folder:
+        ann.json  - kind, count, build and query parameters
+        hnsw.bin  - hnswlib graph
+    """
+
+    kind = "hnsw"
+
+    def __init__(self, path: str, vectors: np.ndarray, ef_search: Optional[int] = None):
+        """
+        Open a persisted index
+
+        Args:
+            path: Index folder written by HNSWIndex.build
+            vectors: The store's (count, dim) vectors
+            ef_search: Candidate list size per query (more = higher recall, slower)
+        """
+        import hnswlib
+
+        self.path = Path(path)
+        with open(self.path / "ann.json", "r", encoding="utf-8") as f:
+            self.info = json.load(f)
+        self.index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+        self.index.load_index(str(self.path / "hnsw.bin"), max_elements=self.info["count"])
+        self.ef_search = ef_search or self.info["ef_search"]
+
+    def set_params(self, ef_search: Optional[int] = None, **unused):
+        if ef_search:
+            self.ef_search = ef_search
+
+    @classmethod
+    def build(cls, path: str, vectors: np.ndarray, M: int = 16,
+              ef_construction: int = 200, ef_search: int = 64,
+              num_threads: int = -1, block_size: int = 65536) -> "HNSWIndex":
+        """
+        Insert every row into an HNSW graph
+
+        Args:
+            path: Destination folder
+            vectors: (count, dim) vectors, e.g. the store's float16 memmap
+            M: Graph degree (memory and recall grow with M)
+            ef_construction: Candidate list size while building
+            ef_search: Default candidate list size per query
+            num_threads: Build threads (-1 = all cores)
+        """
+        import hnswlib
+
+        count, dim = vectors.shape
+        index = hnswlib.Index(space="ip", dim=dim)
+        index.init_index(max_elements=count, M=M, ef_construction=ef_construction, random_seed=42)
+        for start in range(0, count, block_size):
+            block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+            index.add_items(block, np.arange(start, start + len(block)), num_threads=num_threads)
+
+        tmp_path = _fresh_tmp(path)
+        index.save_index(str(tmp_path / "hnsw.bin"))
+        _write_info(tmp_path, {"kind": cls.kind, "count": int(count), "M": M,
+                               "ef_construction": ef_construction, "ef_search": ef_search})
+        swap_directory(tmp_path, Path(path))
+        return cls(path, vectors)
+
+    def search(self, queries: np.ndarray, n: int,
+               mask: Optional[np.ndarray] = None) -> Optional[List[np.ndarray]]:
+        """
+        Approximate top-n rows per query
+
+        Returns:
+            One array of row numbers per query, best first, or None when the
+            filtered partition is too small for the graph to fill n results
+            (the caller then scans the partition exactly)
+        """
+        self.index.set_ef(max(self.ef_search, n))
+        try:
+            if mask is None:
+                labels, _ = self.index.knn_query(queries, k=n)
+            else:
+                labels, _ = self.index.knn_query(queries, k=min(n, int(mask.sum())),
+                                                 filter=lambda label: bool(mask[label]))
+        except RuntimeError:
+            return None
+        return [row.astype(np.int64) for row in labels]
+
+
+ANN_INDEXES = {IVFIndex.kind: IVFIndex, HNSWIndex.kind: HNSWIndex}
+
+
+def _fresh_tmp(path: str) -> Path:
+    tmp_path = Path(path).with_name(Path(path).name + ".tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir(parents=True)
+    return tmp_path
+
+
+def _write_info(directory: Path, info: Dict):
+    with open(directory / "ann.json", "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+
+
+def open_ann_index(path: Path, vectors: np.ndarray, **query_params):
+    """Open whichever ANN index is stored in a folder (None if it is missing or stale)"""
+    path = Path(path)
+    if not (path / "ann.json").exists():
+        return None
+    with open(path / "ann.json", "r", encoding="utf-8") as f:
+        info = json.load(f)
+    if info["count"] != len(vectors):
+        print(f"⚠️  Ignoring stale ANN index in {path} ({info['count']} rows, store has {len(vectors)})")
+        return None
+    index = ANN_INDEXES[info["kind"]](str(path), vectors)
+    index.set_params(**query_params)
+    return index
+
+
+def benchmark_ann(store, query_vectors: np.ndarray, k: int = 10,
+                  settings: Optional[List[Dict]] = None,
+                  metadata_filter: Optional[Dict] = None) -> List[Dict]:
+    """
+    Recall@k and per-query latency of the store's ANN index against exact search
+
+    Args:
+        store: CompactVectorStore with an ANN index attached
+        query_vectors: (B, dim) query embeddings
+        k: Results per query
+        settings: Query parameter sets to try, e.g. [{'nprobe': 4}, {'nprobe': 16}]
+        metadata_filter: Optional filter applied to every query
+
+    Returns:
+        One row per setting (plus 'exact') with recall, mean and p95 latency in ms
+    """
+    if store.ann_index is None:
+        raise ValueError("The store has no ANN index - call build_ann_index first")
+    query_vectors = np.asarray(query_vectors, dtype=np.float32)
+    ann_index = store.ann_index
+
+    def run(label: str, params: Dict) -> Dict:
+        latencies, results = [], []
+        for query in query_vectors:
+            start = time.perf_counter()
+            results.append([i for i, _ in store.search_vectors(query[None], k, filter=metadata_filter)[0]])
+            latencies.append((time.perf_counter() - start) * 1000)
+        return {"setting": label, **params, "results": results,
+                "mean_ms": float(np.mean(latencies)), "p95_ms": float(np.percentile(latencies, 95))}
+
+    store.ann_index = None
+    try:
+        exact = run("exact", {})
+    finally:
+        store.ann_index = ann_index
+
+    rows = [exact]
+    for params in settings or [{}]:
+        ann_index.set_params(**params)
+        rows.append(run(ann_index.kind, params))
+
+    truths = exact["results"]
+    for row in rows:
+        hits = [len(set(found) & set(truth)) / max(1, len(truth))
+                for found, truth in zip(row.pop("results"), truths)]
+        row["recall"] = float(np.mean(hits))
+    return rows
+
+
+# Usage Example
+if __name__ == "__main__":
+    import sys
+
+    from compact_store import CompactVectorStore
+
+    # Synthetic clustered corpus: latency should stay flat as it grows
+    sizes = [int(n) for n in sys.argv[1:]] or [10_000, 100_000]
+    dim = 384
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        centers = rng.normal(size=(256, dim)).astype(np.float32)
+        vectors = centers[rng.integers(256, size=size)] + 0.5 * rng.normal(size=(size, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = vectors[rng.choice(size, 50, replace=False)] + 0.05 * rng.normal(size=(50, dim)).astype(np.float32)
+
+        store = CompactVectorStore.build(f"./ann_bench_{size}", [""] * size, [{}] * size,
+                                         vectors, embedding=None)
+        start = time.perf_counter()
+        store.build_ann_index("ivf")
+        print(f"\n📊 {size:,} chunks - IVF built in {time.perf_counter() - start:.1f}s")
+        for row in benchmark_ann(store, queries, k=10,
+                                 settings=[{"nprobe": p} for p in (1, 4, 8, 16, 32)]):
+            print(f"  {row['setting']:>5} {row.get('nprobe', ''):>3}  recall@10={row['recall']:.3f}  "
+                  f"mean={row['mean_ms']:.2f}ms  p95={row['p95_ms']:.2f}ms")
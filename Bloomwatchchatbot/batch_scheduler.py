@@ -0,0 +1,185 @@
+"""
+batch_scheduler.py
+Dynamic micro-batching for concurrent chat requests
+Requests arriving within a few milliseconds of each other are run as one
+batched forward pass instead of competing for CPU threads one by one
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler queue is full (the API answers 429)"""
+
+
+class MicroBatchScheduler:
+    """
+    Collects concurrent requests into batches for a batched model call
+
+    A single background task takes the first waiting request, keeps
+    collecting until max_batch_size requests are waiting or max_wait_ms has
+    passed, runs process_batch once on a worker thread and resolves every
+    waiting handler with its own result.
+    """
+
+    def __init__(self,
+                 process_batch: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0,
+                 max_queue_size: int = 256,
+                 name: str = "chat"):
+        """
+        Initialize the scheduler
+
+        Args:
+            process_batch: Blocking function mapping a list of requests to a
+                           list of results in the same order
+                           (e.g. processor.batch_search)
+            max_batch_size: Largest batch passed to process_batch
+            max_wait_ms: How long the first request of a batch waits for company
+            max_queue_size: Requests allowed to wait; beyond this submit()
+                            raises QueueFullError
+            name: Label used in log messages
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.name = name
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+
+    async def start(self):
+        """Start the batching task (call from the app's startup hook)"""
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            # One model call at a time - the batch already uses every core
+            self._executor = ThreadPoolExecutor(max_workers=1,
+                                                thread_name_prefix=f"{self.name}-batch")
+            self._task = asyncio.create_task(self._run())
+            print(f"⚙️  {self.name} scheduler: batch≤{self.max_batch_size}, "
+                  f"wait≤{self.max_wait * 1000:.0f}ms, queue≤{self.max_queue_size}")
+
+    async def stop(self):
+        """Stop batching and fail any requests still waiting"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Scheduler stopped"))
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue one request and wait for its result
+
+        Raises:
+            QueueFullError: The queue is full - shed load instead of queueing
+        """
+        if self._task is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"{self.name} queue is full ({self.max_queue_size} waiting)")
+        return await future
+
+    async def submit_or_429(self, item: Any, retry_after: int = 1) -> Any:
+        """submit() for FastAPI handlers: a full queue becomes HTTP 429"""
+        try:
+            return await self.submit(item)
+        except QueueFullError as e:
+            from fastapi import HTTPException
+            raise HTTPException(status_code=429, detail=str(e),
+                                headers={"Retry-After": str(retry_after)})
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        """Wait for one request, then gather more until full or timed out"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Handlers whose client already went away are skipped
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self._executor, self.process_batch, items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"process_batch returned {len(results)} results "
+                                       f"for {len(items)} requests")
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.busy_seconds += time.perf_counter() - start
+                self.batches += 1
+                self.items += len(items)
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        """Batching statistics, for the /info endpoint"""
+        return {
+            "batches": self.batches,
+            "requests": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "rejected": self.rejected,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "requests_per_busy_second": (self.items / self.busy_seconds
+                                         if self.busy_seconds else 0.0)
+        }
+
+
+# Usage Example (inside the FastAPI app)
+#
+# retrieval = MicroBatchScheduler(
+#     lambda requests: processor.batch_search([r.query for r in requests],
+#                                             farm_crops=[r.crop for r in requests]),
+#     max_batch_size=32, max_wait_ms=5, max_queue_size=512, name="retrieval")
+#
+# @app.on_event("startup")
+# async def start_scheduler():
+#     await retrieval.start()
+#
+# @app.post("/chat")
+# async def chat(request: ChatRequest):
+#     documents = await retrieval.submit_or_429(request)
+#     ...
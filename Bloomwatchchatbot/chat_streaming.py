@@ -0,0 +1,201 @@
+"""
+chat_streaming.py
+Server-Sent Events streaming for the /chat endpoint
+Sends the retrieved sources as soon as retrieval finishes, then the answer
+token by token (sentence by sentence when it is translated), then a final
+message with the full response fields
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from translation import split_sentences
+
+# Event sequence:
+#   event: sources  {"sources": [...], "retrieval_ms": ...}
+#   event: token    {"text": "..."}                       (repeated; whole translated
+#                                                          sentences for non-English)
+#   event: done     {"answer", "sources", "language", "farm_data_used", "timings"}
+#   event: error    {"detail": "..."}                     (instead of done)
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"   # stop nginx from buffering the stream
+}
+
+_END = object()
+
+
+def format_sse(event: str, data: Dict) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def source_names(documents: List) -> List[str]:
+    """Unique source file names of the retrieved chunks, in rank order"""
+    names = []
+    for doc in documents:
+        name = os.path.basename(doc.metadata.get("source", "")) or "knowledge_base"
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def stopping_criteria(stop: threading.Event):
+    """
+    transformers StoppingCriteriaList that ends generate() once stop is set,
+    so a disconnected client does not keep the model busy
+    """
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class _StopOnEvent(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs) -> bool:
+            return stop.is_set()
+
+    return StoppingCriteriaList([_StopOnEvent()])
+
+
+async def _iterate_in_thread(tokens: Iterator[str], stop: threading.Event) -> AsyncIterator[str]:
+    """Drive a blocking token iterator from a worker thread"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def produce():
+        try:
+            for token in tokens:
+                loop.call_soon_threadsafe(queue.put_nowait, token)
+                if stop.is_set():
+                    break
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _END)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = await queue.get()
+        if item is _END:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+async def stream_chat(query: str,
+                      retrieve: Callable[[str], List],
+                      generate_tokens: Callable[[str, List, threading.Event], Iterator[str]],
+                      language: str = "en",
+                      farm_data: Optional[Dict] = None,
+                      translate_answer: Optional[Callable[[str, str], str]] = None,
+                      is_disconnected: Optional[Callable[[], Any]] = None) -> AsyncIterator[str]:
+    """
+    Produce the SSE stream for one chat request
+
+    Args:
+        query: The farmer's question (already translated to English)
+        retrieve: query -> retrieved chunks (e.g. processor.search)
+        generate_tokens: (query, chunks, stop) -> iterator of answer tokens;
+                         should end early once stop is set (see stopping_criteria)
+        language: Response language
+        farm_data: farm_data sent with the question
+        translate_answer: (answer, language) -> translated answer; when language
+                          is not English each sentence is translated as soon as
+                          it is complete and streamed in the user's language
+        is_disconnected: Async callable such as starlette's
+                         request.is_disconnected, checked between tokens
+
+    Yields:
+        SSE-encoded events
+    """
+    start = time.perf_counter()
+    stop = threading.Event()
+    tokens: List[str] = []
+    first_token_ms = None
+
+    try:
+        documents = await asyncio.to_thread(retrieve, query)
+        sources = source_names(documents)
+        retrieval_ms = (time.perf_counter() - start) * 1000
+        yield format_sse("sources", {"sources": sources, "retrieval_ms": round(retrieval_ms, 1)})
+
+        translate = translate_answer is not None and language != "en"
+        pending = ""   # English text of the sentence still being generated
+
+        async def translated(pieces) -> str:
+            texts = [await asyncio.to_thread(translate_answer, body, language) + sep
+                     for body, sep in pieces]
+            return "".join(texts)
+
+        async for token in _iterate_in_thread(generate_tokens(query, documents, stop), stop):
+            if is_disconnected is not None and await is_disconnected():
+                stop.set()
+                print(f"⚠️  Client disconnected after {len(tokens)} tokens")
+                return
+            if translate:
+                # Once the next sentence has started, the ones before it are final
+                pending += token
+                pieces = split_sentences(pending)
+                if len(pieces) < 2:
+                    continue
+                body, sep = pieces[-1]
+                pending = pending[len(pending) - len(body) - len(sep):]
+                token = await translated(pieces[:-1])
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - start) * 1000
+            tokens.append(token)
+            yield format_sse("token", {"text": token})
+
+        if translate and pending.strip():
+            tokens.append(await translated(split_sentences(pending)))
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - start) * 1000
+            yield format_sse("token", {"text": tokens[-1]})
+
+        # Streamed text and final answer are the same (translated) text
+        answer = "".join(tokens).strip()
+
+        yield format_sse("done", {
+            "answer": answer,
+            "sources": sources,
+            "language": language,
+            "farm_data_used": bool(farm_data),
+            "timings": {
+                "retrieval_ms": round(retrieval_ms, 1),
+                "first_token_ms": round(first_token_ms or 0.0, 1),
+                "total_ms": round((time.perf_counter() - start) * 1000, 1)
+            }
+        })
+    except (asyncio.CancelledError, GeneratorExit):
+        # Client went away mid-stream - stop the generation thread
+        stop.set()
+        raise
+    except Exception as e:
+        stop.set()
+        print(f"❌ Streaming error: {e}")
+        yield format_sse("error", {"detail": str(e)})
+
+
+def sse_response(events: AsyncIterator[str]):
+    """Wrap an event stream in a FastAPI StreamingResponse"""
+    from fastapi.responses import StreamingResponse
+
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+# Usage Example (inside the FastAPI app)
+#
+# @app.post("/chat/stream")
+# async def chat_stream(request: ChatRequest, http_request: Request):
+#     return sse_response(stream_chat(
+#         request.query,
+#         retrieve=processor.search,
+#         generate_tokens=chatbot.generate_tokens,
+#         language=request.language,
+#         farm_data=request.farm_data,
+#         translate_answer=chatbot.translate,
+#         is_disconnected=http_request.is_disconnected
+#     ))
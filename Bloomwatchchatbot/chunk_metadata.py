@@ -0,0 +1,170 @@
+"""
+chunk_metadata.py
+Category / crop / section metadata for knowledge base chunks,
+and query-time metadata filters built from the farmer's question
+"""
+
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple, Union
+
+# Category folders created by create_mock_knowledge_base.py
+CATEGORIES = [
+    "satellite_interpretation",
+    "crop_health",
+    "fertilizers",
+    "pest_management",
+    "irrigation",
+    "weather_impact",
+    "crop_suggestions"
+]
+
+# Name variants -> canonical crop
+CROPS = {
+    "wheat": "wheat",
+    "rice": "rice",
+    "paddy": "rice",
+    "cotton": "cotton",
+    "soybean": "soybean",
+    "soya": "soybean",
+    "maize": "maize",
+    "corn": "maize",
+    "sugarcane": "sugarcane",
+    "sorghum": "sorghum",
+    "jowar": "sorghum",
+    "bajra": "pearl_millet",
+    "millet": "pearl_millet",
+    "groundnut": "groundnut",
+    "chickpea": "chickpea",
+    "gram": "chickpea",
+    "tur": "pigeon_pea",
+    "onion": "onion",
+    "tomato": "tomato",
+    "grape": "grapes",
+    "grapes": "grapes",
+    "pomegranate": "pomegranate",
+    "mango": "mango"
+}
+
+# Chunks not tied to one crop
+GENERAL_CROP = "general"
+
+CATEGORY_KEYWORDS = {
+    "satellite_interpretation": ["ndvi", "evi", "satellite", "reflectance", "vegetation index"],
+    "crop_health": ["disease", "deficiency", "yellowing", "wilting", "crop health", "stress"],
+    "fertilizers": ["fertilizer", "fertiliser", "npk", "nitrogen", "phosphorus", "potassium",
+                    "urea", "dap", "manure", "micronutrient"],
+    "pest_management": ["pest", "insect", "whitefly", "bollworm", "aphid", "pesticide",
+                        "infestation", "neem"],
+    "irrigation": ["irrigation", "irrigate", "drip", "sprinkler", "watering"],
+    "weather_impact": ["weather", "rainfall", "monsoon", "drought", "frost", "heatwave"],
+    "crop_suggestions": ["which crop", "best crop", "what crop", "suggest", "crop to grow"]
+}
+
+# All-caps lines such as 'WHEAT:', 'RICE (PADDY):' or 'COTTON HEALTH'
+HEADING_RE = re.compile(
+    r"^[ \t]*([A-Z][A-Z0-9 &/,'-]*[A-Z0-9](?:[ \t]*\([^)\n]*\))?)[ \t]*:?[ \t]*$",
+    re.MULTILINE
+)
+_WORD_RE = re.compile(r"[a-z]+")
+
+MetadataFilter = Dict[str, Union[str, List[str]]]
+
+
+def crop_from_text(text: str) -> Optional[str]:
+    """First known crop named in the text, as its canonical name"""
+    for word in _WORD_RE.findall(text.lower()):
+        if word in CROPS:
+            return CROPS[word]
+    return None
+
+
+def category_from_path(rel_path: str) -> str:
+    """Category folder of a knowledge base file ('' for top-level files)"""
+    parts = rel_path.split("/")
+    return parts[0] if len(parts) > 1 else ""
+
+
+def find_headings(text: str) -> List[Tuple[int, str]]:
+    """(character offset, heading) for each all-caps heading line"""
+    return [(m.start(), m.group(1).strip()) for m in HEADING_RE.finditer(text)]
+
+
+def enrich_chunks(chunks: List, headings: List[Tuple[int, str]], rel_path: str,
+                  previous_heading: str = "") -> str:
+    """
+    Add category, crop and section metadata to the chunks of one document
+
+    Each chunk belongs to the last heading before its start_index. The
+    section's crop comes from its heading; sections whose heading names no
+    crop are 'general'.
+
+    Args:
+        chunks: Chunks of one document, split with add_start_index=True
+        headings: find_headings() of that document's text
+        rel_path: File path relative to the knowledge base
+        previous_heading: Heading in effect at the start of the document
+                          (e.g. from the previous PDF page)
+
+    Returns:
+        The heading in effect at the end of the document
+    """
+    category = category_from_path(rel_path)
+    offsets = [offset for offset, _ in headings]
+    for chunk in chunks:
+        start = chunk.metadata.get("start_index", 0)
+        position = bisect_right(offsets, start)
+        if position:
+            section = headings[position - 1][1]
+        elif headings and headings[0][0] < start + len(chunk.page_content):
+            # Chunk starts just before the first heading it contains
+            section = headings[0][1]
+        else:
+            section = previous_heading
+        chunk.metadata["category"] = category
+        chunk.metadata["section"] = section
+        chunk.metadata["crop"] = crop_from_text(section) or GENERAL_CROP
+    return headings[-1][1] if headings else previous_heading
+
+
+def infer_query_filter(query: str, farm_crop: Optional[str] = None) -> MetadataFilter:
+    """
+    Metadata filter for a question, e.g. a cotton fertilizer question ->
+    {'category': 'fertilizers', 'crop': ['cotton', 'general']}
+
+    A category is only used when exactly one category matches, so vague
+    questions still search the whole collection.
+
+    Args:
+        query: The farmer's question (English)
+        farm_crop: Crop from farm_data, used when the question names none
+    """
+    lowered = query.lower()
+    metadata_filter: MetadataFilter = {}
+
+    crop = crop_from_text(lowered) or (crop_from_text(farm_crop) if farm_crop else None)
+    if crop:
+        metadata_filter["crop"] = [crop, GENERAL_CROP]
+
+    words = set(_WORD_RE.findall(lowered))
+    matches = [
+        category for category, keywords in CATEGORY_KEYWORDS.items()
+        if any((keyword in lowered) if " " in keyword else (keyword in words)
+               for keyword in keywords)
+    ]
+    if len(matches) == 1:
+        metadata_filter["category"] = matches[0]
+
+    return metadata_filter
+
+
+def to_chroma_where(metadata_filter: Optional[MetadataFilter]) -> Optional[Dict]:
+    """Convert a simple {field: value or [values]} filter to a Chroma where clause"""
+    if not metadata_filter:
+        return None
+    clauses = [
+        {field: {"$in": list(value)}} if isinstance(value, (list, tuple, set))
+        else {field: {"$eq": value}}
+        for field, value in metadata_filter.items()
+    ]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -0,0 +1,515 @@
+"""
+compact_store.py
+Compact, memory-mapped vector store for the BloomWatch knowledge base
+float16 vectors (optionally product-quantized) + a compact metadata sidecar
+"""
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.embeddings.base import Embeddings
+from langchain.vectorstores.base import VectorStore
+
+FORMAT_VERSION = 1
+
+
+# Metadata fields indexed as integer codes for pre-filtering
+FACET_FIELDS = ("category", "crop")
+
+# Sub-folder holding the optional ANN index
+ANN_FOLDER = "ann"
+
+
+def write_records(directory: Path, texts: Iterable[str], metadatas: Iterable[Dict]) -> int:
+    """
+    Write chunk texts + metadata as records.bin / offsets.npy in a folder,
+    plus facet_<field>.npy code arrays and facets.json for FACET_FIELDS
+
+    Returns:
+        Number of records written
+    """
+    offsets = [0]
+    facet_values: Dict[str, Dict[str, int]] = {field: {} for field in FACET_FIELDS}
+    facet_codes: Dict[str, List[int]] = {field: [] for field in FACET_FIELDS}
+    with open(directory / "records.bin", "wb") as f:
+        for text, metadata in zip(texts, metadatas):
+            metadata = metadata or {}
+            record = json.dumps({"text": text, "metadata": metadata},
+                                ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            f.write(record)
+            offsets.append(offsets[-1] + len(record))
+            for field in FACET_FIELDS:
+                values = facet_values[field]
+                value = str(metadata.get(field, ""))
+                facet_codes[field].append(values.setdefault(value, len(values)))
+    np.save(directory / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+    for field in FACET_FIELDS:
+        np.save(directory / f"facet_{field}.npy", np.asarray(facet_codes[field], dtype=np.int32))
+    with open(directory / "facets.json", "w", encoding="utf-8") as f:
+        json.dump({field: list(values) for field, values in facet_values.items()}, f,
+                  ensure_ascii=False)
+    return len(offsets) - 1
+
+
+def swap_directory(new_path: Path, path: Path):
+    """
+    Move a freshly written folder into place, replacing any previous one
+
+    path is a symlink to a versioned sibling folder (<name>.v<ns>), and the
+    swap re-points it with one atomic rename, so readers always find either
+    the old or the new complete folder. The previous version is kept for
+    readers still opening it; older ones are removed.
+    """
+    version_path = path.with_name(f"{path.name}.v{time.time_ns()}")
+    os.replace(new_path, version_path)
+    previous = os.readlink(path) if path.is_symlink() else None
+
+    link_tmp = path.with_name(path.name + ".link")
+    if link_tmp.is_symlink() or link_tmp.exists():
+        link_tmp.unlink()
+    try:
+        os.symlink(version_path.name, link_tmp, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        # No symlinks (e.g. Windows without developer mode): plain folder swap
+        _replace_folder(version_path, path)
+        return
+    if path.exists() and not path.is_symlink():
+        # Folder from before versioned swaps: a one-off non-atomic move
+        old_path = path.with_name(path.name + ".old")
+        if old_path.exists():
+            shutil.rmtree(old_path)
+        os.replace(path, old_path)
+        shutil.rmtree(old_path)
+    os.replace(link_tmp, path)
+
+    for sibling in path.parent.glob(f"{path.name}.v*"):
+        if sibling.name not in (version_path.name, previous) and sibling.is_dir():
+            shutil.rmtree(sibling, ignore_errors=True)
+
+
+def _replace_folder(new_path: Path, path: Path):
+    old_path = path.with_name(path.name + ".old")
+    if path.exists():
+        if old_path.exists():
+            shutil.rmtree(old_path)
+        os.replace(path, old_path)
+    os.replace(new_path, path)
+    if old_path.exists():
+        shutil.rmtree(old_path)
+
+
+class RecordReader:
+    """Random access to records written by write_records, via mmap"""
+
+    def __init__(self, directory: Path):
+        self.offsets = np.load(directory / "offsets.npy", mmap_mode="r")
+        self.records = (np.memmap(directory / "records.bin", dtype=np.uint8, mode="r")
+                        if self.offsets[-1] > 0 else np.zeros(0, dtype=np.uint8))
+
+        self.facet_values: Dict[str, List[str]] = {}
+        self.facet_codes: Dict[str, np.ndarray] = {}
+        if (directory / "facets.json").exists():
+            with open(directory / "facets.json", "r", encoding="utf-8") as f:
+                self.facet_values = json.load(f)
+            for field in self.facet_values:
+                self.facet_codes[field] = np.load(directory / f"facet_{field}.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def facet_mask(self, metadata_filter: Optional[Dict]) -> Optional[np.ndarray]:
+        """
+        Boolean row mask for a {field: value or [values]} filter
+        (None when there is nothing to filter on)
+        """
+        if not metadata_filter:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        for field, wanted in metadata_filter.items():
+            if field not in self.facet_codes:
+                raise ValueError(f"Metadata field '{field}' is not indexed for filtering "
+                                 f"(indexed: {', '.join(self.facet_codes) or 'none'})")
+            wanted = [wanted] if isinstance(wanted, str) else list(wanted)
+            values = self.facet_values[field]
+            codes = [values.index(value) for value in wanted if value in values]
+            mask &= np.isin(self.facet_codes[field], codes)
+        return mask
+
+    def __getitem__(self, index: int) -> Document:
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        record = json.loads(bytes(self.records[start:end]).decode("utf-8"))
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+
+def _train_kmeans(data: np.ndarray, n_clusters: int, iterations: int = 10,
+                  seed: int = 42) -> np.ndarray:
+    """Plain Lloyd's k-means, returns the (n_clusters, dim) centroids"""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(data))
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    data_sq = (data ** 2).sum(axis=1, keepdims=True)
+    for _ in range(iterations):
+        distances = data_sq - 2 * data @ centroids.T + (centroids ** 2).sum(axis=1)
+        assignment = distances.argmin(axis=1)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.stack([np.bincount(assignment, weights=data[:, d], minlength=n_clusters)
+                         for d in range(data.shape[1])], axis=1)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters from random points
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = data[rng.integers(len(data), size=len(empty))]
+    return centroids
+
+
+class ProductQuantizer:
+    """Splits vectors into m sub-vectors, each encoded as one byte"""
+
+    def __init__(self, codebooks: np.ndarray):
+        """
+        Args:
+            codebooks: (m, k, dsub) float32 centroids, k <= 256
+        """
+        self.codebooks = codebooks.astype(np.float32)
+        self.m, self.k, self.dsub = self.codebooks.shape
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, m: int, sample_size: int = 10000,
+              seed: int = 42) -> "ProductQuantizer":
+        """Train m codebooks of up to 256 centroids on a sample of the vectors"""
+        dim = vectors.shape[1]
+        if dim % m:
+            raise ValueError(f"Vector dimension {dim} is not divisible by {m} sub-vectors")
+        rng = np.random.default_rng(seed)
+        if len(vectors) > sample_size:
+            vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dsub = dim // m
+        k = min(256, len(vectors))
+        codebooks = np.stack([
+            _train_kmeans(vectors[:, i * dsub:(i + 1) * dsub], k, seed=seed + i)
+            for i in range(m)
+        ])
+        return cls(codebooks)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, dim) float vectors -> (n, m) uint8 codes"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for i in range(self.m):
+            sub = vectors[:, i * self.dsub:(i + 1) * self.dsub]
+            book = self.codebooks[i]
+            distances = (sub ** 2).sum(axis=1, keepdims=True) - 2 * sub @ book.T + (book ** 2).sum(axis=1)
+            codes[:, i] = distances.argmin(axis=1)
+        return codes
+
+    def inner_product_table(self, query: np.ndarray) -> np.ndarray:
+        """(m, k) lookup table of query sub-vector . centroid"""
+        sub_queries = query.reshape(self.m, self.dsub)
+        return np.einsum("md,mkd->mk", sub_queries, self.codebooks)
+
+
+class CompactVectorStore(VectorStore):
+    """
+    Read-only vector store backed by memory-mapped files
+
+    Layout of the store folder:
+        header.json    - count, dimension, embedding model, PQ settings
+        vectors.f16    - (count, dim) float16 vectors, used for exact re-ranking
+        pq_codes.u8    - (count, m) product-quantization codes (optional)
+        pq_codebooks.npy
+        records.bin    - UTF-8 JSON {"text", "metadata"} per chunk, back to back
+        offsets.npy    - (count + 1) int64 byte offsets into records.bin
+        ann/           - optional IVF / HNSW index over the vectors (see ann_index)
+
+    Every file is opened with mmap, so loading takes milliseconds and
+    uvicorn workers on one host share the same page-cache copy.
+    """
+
+    def __init__(self, path: str, embedding: Embeddings):
+        """
+        Open an existing compact store
+
+        Args:
+            path: Store folder written by CompactVectorStore.build
+            embedding: Query embedding function (same model used at build time)
+        """
+        # Resolved once, so every file comes from the same swapped-in version
+        self.path = Path(path).resolve()
+        self._embedding = embedding
+
+        with open(self.path / "header.json", "r", encoding="utf-8") as f:
+            self.header = json.load(f)
+        if self.header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact store version in {self.path}")
+
+        count, dim = self.header["count"], self.header["dim"]
+        self.vectors = np.memmap(self.path / "vectors.f16", dtype=np.float16,
+                                 mode="r", shape=(count, dim))
+        self.records = RecordReader(self.path)
+
+        self.pq = None
+        self.pq_codes = None
+        if self.header.get("pq_subvectors"):
+            self.pq = ProductQuantizer(np.load(self.path / "pq_codebooks.npy"))
+            self.pq_codes = np.memmap(self.path / "pq_codes.u8", dtype=np.uint8,
+                                      mode="r", shape=(count, self.pq.m))
+
+        # Filtered searches over fewer rows than this skip the ANN index
+        self.ann_exact_below = 20000
+        self.ann_index = None
+        if (self.path / ANN_FOLDER).exists():
+            from ann_index import open_ann_index
+            self.ann_index = open_ann_index(self.path / ANN_FOLDER, self.vectors)
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    @classmethod
+    def build(cls,
+              path: str,
+              texts: List[str],
+              metadatas: List[Dict],
+              vectors: np.ndarray,
+              embedding: Embeddings,
+              pq_subvectors: Optional[int] = None,
+              model_id: str = "") -> "CompactVectorStore":
+        """
+        Write a compact store, replacing any previous one atomically
+
+        Args:
+            path: Destination folder
+            texts: Chunk texts
+            metadatas: Chunk metadata dicts (aligned with texts)
+            vectors: (n, dim) embeddings (aligned with texts)
+            embedding: Query embedding function for the opened store
+            pq_subvectors: If set, also store PQ codes with this many sub-vectors
+            model_id: Embedding model identifier, recorded in the header
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) == 0:
+            raise ValueError("CompactVectorStore.build needs a non-empty (n, dim) vector matrix")
+        count, dim = vectors.shape
+
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        out = np.memmap(tmp_path / "vectors.f16", dtype=np.float16, mode="w+",
+                        shape=(count, dim))
+        out[:] = vectors
+        out.flush()
+        del out
+
+        write_records(tmp_path, texts, metadatas)
+
+        if pq_subvectors:
+            pq = ProductQuantizer.train(vectors, pq_subvectors)
+            np.save(tmp_path / "pq_codebooks.npy", pq.codebooks)
+            codes = np.memmap(tmp_path / "pq_codes.u8", dtype=np.uint8, mode="w+",
+                              shape=(count, pq.m))
+            for start in range(0, count, 65536):
+                codes[start:start + 65536] = pq.encode(vectors[start:start + 65536])
+            codes.flush()
+            del codes
+
+        with open(tmp_path / "header.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "count": int(count),
+                "dim": int(dim),
+                "model_id": model_id,
+                "pq_subvectors": pq_subvectors
+            }, f, indent=2)
+
+        swap_directory(tmp_path, path)
+
+        return cls(str(path), embedding)
+
+    @classmethod
+    def from_chroma(cls, chroma_store, path: str, embedding: Embeddings,
+                    pq_subvectors: Optional[int] = None,
+                    model_id: str = "") -> "CompactVectorStore":
+        """
+        Convert an existing LangChain Chroma store into a compact store
+
+        Args:
+            chroma_store: langchain Chroma vector store
+            path: Destination folder
+            embedding: Query embedding function
+            pq_subvectors: If set, also store PQ codes with this many sub-vectors
+            model_id: Embedding model identifier, recorded in the header
+        """
+        data = chroma_store.get(include=["embeddings", "documents", "metadatas"])
+        return cls.build(path, data["documents"], data["metadatas"],
+                         np.asarray(data["embeddings"], dtype=np.float32),
+                         embedding, pq_subvectors=pq_subvectors, model_id=model_id)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings,
+                   metadatas: Optional[List[dict]] = None,
+                   path: str = "./vector_db_compact",
+                   pq_subvectors: Optional[int] = None,
+                   **kwargs: Any) -> "CompactVectorStore":
+        vectors = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+        return cls.build(path, texts, metadatas or [{} for _ in texts], vectors,
+                         embedding, pq_subvectors=pq_subvectors)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  **kwargs: Any) -> List[str]:
+        raise NotImplementedError("CompactVectorStore is read-only; rebuild it with "
+                                  "CompactVectorStore.build or from_chroma")
+
+    def get_document(self, index: int) -> Document:
+        """Decode one chunk from the metadata sidecar"""
+        return self.records[index]
+
+    def build_ann_index(self, kind: str = "ivf", **params):
+        """
+        Build an approximate nearest-neighbour index over this store's vectors
+        and use it for subsequent searches
+
+        Args:
+            kind: 'ivf' (numpy) or 'hnsw' (needs hnswlib)
+            params: Build parameters - nlist / nprobe for IVF,
+                    M / ef_construction / ef_search for HNSW
+        """
+        from ann_index import ANN_INDEXES
+
+        if kind not in ANN_INDEXES:
+            raise ValueError(f"Unknown ANN index '{kind}' (choose from {', '.join(ANN_INDEXES)})")
+        self.ann_index = ANN_INDEXES[kind].build(str(self.path / ANN_FOLDER), self.vectors, **params)
+        return self.ann_index
+
+    def _top_candidates(self, queries: np.ndarray, n: int,
+                        mask: Optional[np.ndarray] = None,
+                        block_size: int = 65536) -> np.ndarray:
+        """
+        Approximate top-n rows for a (B, dim) batch of queries, scanning the
+        (filtered) store block by block with one matrix product per block
+
+        Returns:
+            (n_found, B) row indices, one column per query
+        """
+        count = len(self)
+        num_queries = len(queries)
+        best_idx = np.empty((0, num_queries), dtype=np.int64)
+        best_scores = np.empty((0, num_queries), dtype=np.float32)
+        tables = ([self.pq.inner_product_table(q) for q in queries]
+                  if self.pq is not None else None)
+
+        for start in range(0, count, block_size):
+            stop = min(start + block_size, count)
+            if mask is None:
+                idx = np.arange(start, stop)
+                rows = slice(start, stop)
+            else:
+                idx = start + np.flatnonzero(mask[start:stop])
+                if not len(idx):
+                    continue
+                rows = idx
+            if tables is not None:
+                codes = self.pq_codes[rows]
+                subspaces = np.arange(self.pq.m)
+                scores = np.stack([table[subspaces, codes].sum(axis=1) for table in tables],
+                                  axis=1).astype(np.float32)
+            else:
+                scores = self.vectors[rows].astype(np.float32) @ queries.T
+            block_idx = np.broadcast_to(idx[:, None], scores.shape)
+            if len(scores) > n:
+                keep = np.argpartition(-scores, n - 1, axis=0)[:n]
+                scores = np.take_along_axis(scores, keep, axis=0)
+                block_idx = np.take_along_axis(block_idx, keep, axis=0)
+            best_scores = np.concatenate([best_scores, scores])
+            best_idx = np.concatenate([best_idx, block_idx])
+            if len(best_scores) > n:
+                keep = np.argpartition(-best_scores, n - 1, axis=0)[:n]
+                best_scores = np.take_along_axis(best_scores, keep, axis=0)
+                best_idx = np.take_along_axis(best_idx, keep, axis=0)
+        return best_idx
+
+    def search_vectors(self, query_vectors: np.ndarray, k: int = 4,
+                       rerank_k: int = 100,
+                       filter: Optional[Dict] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Find the k most similar chunks for each query in a batch
+
+        Candidates come from the ANN index when one is attached, otherwise
+        from one pass over the PQ codes (or float16 vectors) for all queries;
+        each query's top rerank_k are then re-scored exactly in float32.
+
+        Args:
+            query_vectors: (B, dim) query embeddings
+            k: Number of results per query
+            rerank_k: Candidates re-scored exactly
+            filter: Optional {field: value or [values]} pre-filter on the
+                    indexed metadata fields (category, crop), shared by the batch
+
+        Returns:
+            Per query, (row index, cosine similarity) pairs, best first
+        """
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.header["dim"])
+        if len(self) == 0:
+            return [[] for _ in queries]
+        n = min(len(self), max(k, rerank_k))
+        mask = self.records.facet_mask(filter)
+
+        candidates = None
+        if self.ann_index is not None and (mask is None or mask.sum() >= self.ann_exact_below):
+            candidates = self.ann_index.search(queries, n, mask)
+        if candidates is None:
+            top = self._top_candidates(queries, n, mask)
+            candidates = [top[:, column] for column in range(len(queries))]
+
+        results = []
+        for query, query_candidates in zip(queries, candidates):
+            rows = np.sort(query_candidates)
+            if not len(rows):
+                results.append([])
+                continue
+            exact = self.vectors[rows].astype(np.float32) @ query
+            order = np.argsort(-exact)[:k]
+            results.append([(int(rows[i]), float(exact[i])) for i in order])
+        return results
+
+    def search_vector(self, query_vector: List[float], k: int = 4,
+                      rerank_k: int = 100,
+                      filter: Optional[Dict] = None) -> List[Tuple[int, float]]:
+        """
+        Find the k most similar chunks (see search_vectors)
+
+        Returns:
+            (row index, cosine similarity) pairs, best first
+        """
+        return self.search_vectors(np.asarray([query_vector]), k, rerank_k, filter)[0]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Return (document, cosine similarity) pairs - higher is more similar"""
+        query_vector = self._embedding.embed_query(query)
+        return [(self.get_document(i), score)
+                for i, score in self.search_vector(query_vector, k, **kwargs)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    **kwargs: Any) -> List[Document]:
+        return [self.get_document(i) for i, _ in self.search_vector(embedding, k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
@@ -1,14 +1,78 @@
 import os
+import json
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import List
-from langchain.document_loaders import (
-    PyPDFLoader,
-    TextLoader,
-    DirectoryLoader
-)
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import Chroma
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+# Document loaders, the text splitter and Chroma (chromadb) are imported where
+# they are used, so importing this module stays cheap for the API's cold start
+from langchain.docstore.document import Document
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+from embedding_engine import BloomWatchEmbeddingEngine
+from compact_store import CompactVectorStore
+from hybrid_retriever import BM25Index, HybridRetriever
+from chunk_metadata import enrich_chunks, find_headings, infer_query_filter, to_chroma_where
+
+# Bump when the chunk metadata scheme changes so incremental runs re-index
+CHUNK_METADATA_VERSION = 1
+
+
+@lru_cache(maxsize=4)
+def _get_text_splitter(chunk_size: int, chunk_overlap: int):
+    """One splitter per (chunk_size, chunk_overlap) and worker process"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", ". ", " ", ""],
+        add_start_index=True
+    )
+
+
+def _load_and_split_file(path: str, rel_path: str,
+                         chunk_size: int, chunk_overlap: int) -> Tuple[str, List]:
+    """
+    Hash, parse and split a single PDF/TXT file, tagging each chunk with
+    its category, crop and section heading
+    Runs inside a worker process, so it must stay a module-level function
+    
+    Returns:
+        (content hash, chunks)
+    """
+    from langchain.document_loaders import PyPDFLoader, TextLoader
+
+    file_hash = BloomWatchDocumentProcessor.hash_file(Path(path))
+    if path.lower().endswith(".pdf"):
+        documents = PyPDFLoader(path).load()
+    else:
+        documents = TextLoader(path).load()
+    
+    splitter = _get_text_splitter(chunk_size, chunk_overlap)
+    chunks = []
+    heading = ""
+    # Split page by page so start_index lines up with that page's headings
+    for document in documents:
+        document_chunks = splitter.split_documents([document])
+        heading = enrich_chunks(document_chunks, find_headings(document.page_content),
+                                rel_path, heading)
+        chunks.extend(document_chunks)
+    return file_hash, chunks
+
+
+def _batched(iterable: Iterable, batch_size: int) -> Iterator[List]:
+    """Yield fixed-size lists from an iterable (the last one may be shorter)"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
 
 class BloomWatchDocumentProcessor:
     """
@@ -19,7 +83,17 @@ class BloomWatchDocumentProcessor:
     def __init__(self, 
                  knowledge_base_path: str = "./knowledge_base",
                  vector_db_path: str = "./vector_db",
-                 embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"):
+                 embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 embedding_cache_path: Optional[str] = "./embedding_cache.sqlite",
+                 embedding_cache_size: int = 500_000,
+                 device: str = "cpu",
+                 embedding_batch_size: int = 64,
+                 embedding_threads: Optional[int] = None,
+                 embedding_processes: int = 0,
+                 embedding_backend: str = "torch",
+                 quantize_embeddings: bool = False,
+                 lazy_load: bool = False,
+                 hnsw_params: Optional[Dict] = None):
         """
         Initialize the document processor
         
@@ -27,6 +101,17 @@ class BloomWatchDocumentProcessor:
             knowledge_base_path: Path to folder containing source documents
             vector_db_path: Path where vector database will be stored
             embedding_model: HuggingFace model for embeddings
+            embedding_cache_path: SQLite file for cached embeddings (None disables)
+            embedding_cache_size: Max cached vectors before LRU eviction
+            device: 'cpu' or 'cuda' for the embedding model
+            embedding_batch_size: Chunks per embedding forward pass
+            embedding_threads: torch intra-op threads (None = torch default)
+            embedding_processes: Embedding worker processes (0 = single process)
+            embedding_backend: 'torch' or 'onnx' (ONNX Runtime)
+            quantize_embeddings: With the ONNX backend, use int8 quantized weights
+            lazy_load: Load the embedding model on first use instead of here
+            hnsw_params: Chroma HNSW settings for a new collection
+                         (M, ef_construction, ef_search)
         """
         self.knowledge_base_path = Path(knowledge_base_path)
         self.vector_db_path = Path(vector_db_path)
@@ -36,20 +121,43 @@ class BloomWatchDocumentProcessor:
         print(f"💾 Vector DB: {self.vector_db_path}")
         
         # Initialize embedding model
-        print(f"🤖 Loading embedding model: {embedding_model}")
-        self.embeddings = HuggingFaceEmbeddings(
+        print(f"🤖 {'Deferring' if lazy_load else 'Loading'} embedding model: {embedding_model}")
+        self.embedding_engine = BloomWatchEmbeddingEngine(
             model_name=embedding_model,
-            model_kwargs={'device': 'cpu'},  # Change to 'cuda' if GPU available
-            encode_kwargs={'normalize_embeddings': True}
+            device=device,
+            batch_size=embedding_batch_size,
+            num_threads=embedding_threads,
+            num_processes=embedding_processes,
+            normalize=True,
+            backend=embedding_backend,
+            quantize=quantize_embeddings,
+            lazy=lazy_load
         )
+        self.embeddings = self.embedding_engine
+        
+        # Reuse vectors of identical chunks/queries across runs
+        if embedding_cache_path:
+            print(f"🗄️  Embedding cache: {embedding_cache_path}")
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                EmbeddingCache(embedding_cache_path, max_entries=embedding_cache_size),
+                model_name=self.embedding_engine.model_id,
+                normalize=True
+            )
         
         self.vector_store = None
+        self.manifest_path = self.vector_db_path / "index_manifest.json"
+        self.bm25_path = self.vector_db_path / "bm25_index"
+        self.bm25_index = None
+        self.hnsw_params = hnsw_params
         
     def load_documents(self) -> List:
         """
         Load all documents from the knowledge base folder
         Supports: PDF, TXT files
         """
+        from langchain.document_loaders import DirectoryLoader, PyPDFLoader, TextLoader
+
         documents = []
         
         print("\n📚 Loading documents...")
@@ -94,25 +202,23 @@ class BloomWatchDocumentProcessor:
         print(f"   Chunk size: {chunk_size} characters")
         print(f"   Overlap: {chunk_overlap} characters")
         
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+        text_splitter = _get_text_splitter(chunk_size, chunk_overlap)
         
         chunks = text_splitter.split_documents(documents)
         print(f"✅ Created {len(chunks)} chunks")
         
         return chunks
     
-    def create_vector_store(self, chunks: List):
+    def create_vector_store(self, chunks: List, ids: Optional[List[str]] = None):
         """
         Create and persist the vector database
         
         Args:
             chunks: Document chunks to embed and store
+            ids: Optional stable chunk IDs (see assign_chunk_ids)
         """
+        from langchain.vectorstores import Chroma
+
         print(f"\n🔮 Creating vector database...")
         print(f"   This may take a few minutes...")
         
@@ -120,6 +226,7 @@ class BloomWatchDocumentProcessor:
         self.vector_store = Chroma.from_documents(
             documents=chunks,
             embedding=self.embeddings,
+            ids=ids,
             persist_directory=str(self.vector_db_path),
             collection_name="bloomwatch_agriculture"
         )
@@ -127,46 +234,532 @@ class BloomWatchDocumentProcessor:
         # Persist to disk
         self.vector_store.persist()
         print(f"✅ Vector database created and saved to {self.vector_db_path}")
+        self.print_embedding_stats()
         
-    def process_all(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def print_embedding_stats(self):
+        """Print embedding throughput and cache hit/miss statistics"""
+        engine_stats = self.embedding_engine.stats()
+        print(f"⚡ Embedded {engine_stats['texts_embedded']} chunks in "
+              f"{engine_stats['seconds']:.1f}s "
+              f"({engine_stats['chunks_per_second']:.1f} chunks/s)")
+        if not isinstance(self.embeddings, CachedEmbeddings):
+            return
+        stats = self.embeddings.stats()
+        print(f"🗄️  Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.1%} hit rate), {stats['entries']} entries, "
+              f"{stats['evictions']} evicted")
+        
+    def process_all(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                    incremental: bool = False,
+                    workers: Optional[int] = None,
+                    batch_size: int = 256):
         """
         Complete pipeline: Load -> Split -> Embed -> Store
+        
+        Files are parsed and split in a process pool and streamed to the
+        vector store in fixed-size batches, so peak memory does not grow
+        with the size of the knowledge base. A full (non-incremental) run
+        replaces the whole collection.
+        
+        Args:
+            chunk_size: Size of each chunk in characters
+            chunk_overlap: Overlap between chunks to maintain context
+            incremental: Only re-embed new/changed files and drop removed ones
+                         (uses the manifest kept next to the vector DB)
+            workers: Parser processes (defaults to the number of CPU cores)
+            batch_size: Chunks embedded and written per batch
         """
         print("="*60)
         print("🌾 BLOOMWATCH KNOWLEDGE BASE CREATION")
         print("="*60)
         
-        # Step 1: Load documents
-        documents = self.load_documents()
+        if incremental:
+            self.update_vector_store(chunk_size, chunk_overlap, workers, batch_size)
+            print("\n" + "="*60)
+            print("✅ KNOWLEDGE BASE READY!")
+            print("="*60)
+            return
+        
+        # Step 1: Find documents
+        files = self.scan_knowledge_base()
         
-        if len(documents) == 0:
+        if len(files) == 0:
             print("⚠️  No documents found! Please add documents to the knowledge_base folder.")
             return
         
-        # Step 2: Split into chunks
-        chunks = self.split_documents(documents, chunk_size, chunk_overlap)
+        print(f"\n📚 Streaming {len(files)} documents -> split -> embed...")
+        print(f"   Chunk size: {chunk_size} characters, overlap: {chunk_overlap} characters")
+        
+        # Step 2: Start from an empty collection, so vectors of deleted files
+        # and trailing chunk ids of shrunken files don't survive the rebuild.
+        # The manifest goes first: if the rebuild dies half-way, the next
+        # incremental run must not trust a manifest for vectors that are gone
+        self.manifest_path.unlink(missing_ok=True)
+        self._open_vector_store().delete_collection()
+        self._open_vector_store()
         
-        # Step 3: Create vector store
-        self.create_vector_store(chunks)
+        # Step 3: Load + split in worker processes, embed in fixed-size batches
+        indexed = {}
+        total = self.add_chunks_in_batches(
+            self.iter_file_chunks(files, chunk_size, chunk_overlap, workers, indexed),
+            batch_size
+        )
+        self.vector_store.persist()
+        print(f"✅ Vector database created with {total} chunks at {self.vector_db_path}")
+        self.print_embedding_stats()
+        
+        # Step 4: Record what was indexed so later runs can be incremental
+        self.save_manifest(indexed, chunk_size, chunk_overlap)
+        
+        # Step 5: Lexical index over the same chunks for hybrid retrieval
+        self.build_bm25_index()
         
         print("\n" + "="*60)
         print("✅ KNOWLEDGE BASE READY!")
         print("="*60)
+    
+    def scan_knowledge_base(self) -> Dict[str, Path]:
+        """
+        Find all supported source files in the knowledge base
         
-    def load_existing_vector_store(self):
+        Returns:
+            Mapping of path relative to the knowledge base -> absolute path
         """
-        Load an existing vector database
+        files = {}
+        for pattern in ("**/*.pdf", "**/*.txt"):
+            for path in sorted(self.knowledge_base_path.glob(pattern)):
+                if path.is_file():
+                    files[path.relative_to(self.knowledge_base_path).as_posix()] = path
+        return files
+    
+    @staticmethod
+    def hash_file(path: Path) -> str:
+        """SHA-256 of a file's content, read in 1 MB blocks"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def iter_file_chunks(self, files: Dict[str, Path],
+                         chunk_size: int = 1000,
+                         chunk_overlap: int = 200,
+                         workers: Optional[int] = None,
+                         indexed: Optional[Dict] = None) -> Iterator[Tuple]:
         """
-        print(f"📂 Loading existing vector database from {self.vector_db_path}")
+        Stream (chunk, chunk_id) pairs for the given files
+        
+        Files are hashed, parsed and split in a process pool. Only a small
+        window of files is in flight at a time, and results are yielded in
+        file order so chunk IDs ('<relative path>::<n>') are deterministic.
+        
+        Args:
+            files: relative path -> absolute path (see scan_knowledge_base)
+            chunk_size: Size of each chunk in characters
+            chunk_overlap: Overlap between chunks to maintain context
+            workers: Parser processes (defaults to the number of CPU cores)
+            indexed: Optional dict filled with manifest entries as files complete
+        """
+        workers = workers or os.cpu_count() or 1
+        items = iter(files.items())
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            
+            def submit_next() -> bool:
+                item = next(items, None)
+                if item is None:
+                    return False
+                rel_path, path = item
+                future = executor.submit(_load_and_split_file, str(path), rel_path,
+                                         chunk_size, chunk_overlap)
+                pending.append((rel_path, future))
+                return True
+            
+            # Keep every worker busy with one file queued behind it
+            for _ in range(workers * 2):
+                if not submit_next():
+                    break
+            
+            while pending:
+                rel_path, future = pending.popleft()
+                try:
+                    file_hash, chunks = future.result()
+                except Exception as e:
+                    print(f"❌ Failed to load {rel_path}: {e}")
+                    submit_next()
+                    continue
+                submit_next()
+                
+                chunk_ids = [f"{rel_path}::{i}" for i in range(len(chunks))]
+                for chunk, chunk_id in zip(chunks, chunk_ids):
+                    chunk.metadata["chunk_id"] = chunk_id
+                if indexed is not None:
+                    indexed[rel_path] = {"hash": file_hash, "chunk_ids": chunk_ids}
+                yield from zip(chunks, chunk_ids)
+    
+    def add_chunks_in_batches(self, chunk_pairs: Iterable[Tuple], batch_size: int = 256) -> int:
+        """
+        Embed and upsert (chunk, chunk_id) pairs into the open vector store
+        
+        Args:
+            chunk_pairs: Iterable of (chunk, chunk_id), e.g. from iter_file_chunks
+            batch_size: Chunks embedded and written per batch
+            
+        Returns:
+            Number of chunks written
+        """
+        total = 0
+        for batch in _batched(chunk_pairs, batch_size):
+            chunks, ids = zip(*batch)
+            self.vector_store.add_documents(list(chunks), ids=list(ids))
+            total += len(batch)
+            print(f"   Embedded {total} chunks...")
+        return total
+    
+    def load_manifest(self) -> Optional[Dict]:
+        """Load the index manifest, or None if it does not exist yet"""
+        if not self.manifest_path.exists():
+            return None
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    
+    def _index_settings(self, chunk_size: int, chunk_overlap: int) -> Dict:
+        """Settings that invalidate every indexed chunk when they change"""
+        return {
+            "embedding_model": self.embedding_engine.model_id,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "chunk_metadata": CHUNK_METADATA_VERSION
+        }
+    
+    def index_version(self) -> int:
+        """
+        Changes every time the vector database is (re)built or synced;
+        used to invalidate caches of answers derived from it
+        """
+        try:
+            return self.manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+    
+    def save_manifest(self, files: Dict, chunk_size: int, chunk_overlap: int):
+        """
+        Atomically write the index manifest
+        
+        Args:
+            files: relative path -> {"hash": ..., "chunk_ids": [...]}
+            chunk_size: Chunk size the index was built with
+            chunk_overlap: Chunk overlap the index was built with
+        """
+        manifest = {
+            "settings": self._index_settings(chunk_size, chunk_overlap),
+            "files": files
+        }
+        self.vector_db_path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+    
+    def update_vector_store(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                            workers: Optional[int] = None,
+                            batch_size: int = 256):
+        """
+        Incrementally sync the vector database with the knowledge base
+        
+        Files whose content hash is unchanged are skipped, new or changed
+        files are re-split and upserted, and the vectors of removed files
+        are deleted. If the chunking settings or embedding model changed
+        since the last run, every file is treated as changed.
+        
+        Args:
+            chunk_size: Size of each chunk in characters
+            chunk_overlap: Overlap between chunks to maintain context
+            workers: Parser processes (defaults to the number of CPU cores)
+            batch_size: Chunks embedded and written per batch
+        """
+        print("\n🔄 Incremental update of vector database...")
         
+        manifest = self.load_manifest()
+        if manifest is None and self.vector_db_path.exists():
+            print("⚠️  No manifest found - existing vectors cannot be tracked; "
+                  "run process_all() without incremental to reset the collection.")
+        
+        settings = self._index_settings(chunk_size, chunk_overlap)
+        old_files = (manifest or {}).get("files", {})
+        if manifest is not None and manifest.get("settings") != settings:
+            print("⚠️  Chunking settings, metadata or embedding model changed - re-indexing everything")
+            stale = dict(old_files)
+            old_files = {}
+        else:
+            stale = {}
+        
+        current = self.scan_knowledge_base()
+        hashes = {rel_path: self.hash_file(path) for rel_path, path in current.items()}
+        
+        changed = [rel_path for rel_path in current
+                   if old_files.get(rel_path, {}).get("hash") != hashes[rel_path]]
+        removed = [rel_path for rel_path in old_files if rel_path not in current]
+        
+        print(f"   New/changed files: {len(changed)}")
+        print(f"   Removed files: {len(removed)}")
+        print(f"   Unchanged files: {len(current) - len(changed)}")
+        
+        self._open_vector_store()
+        
+        # Drop vectors of removed files, changed files and stale settings
+        delete_ids = []
+        for rel_path in removed + changed:
+            delete_ids.extend(old_files.get(rel_path, {}).get("chunk_ids", []))
+        for entry in stale.values():
+            delete_ids.extend(entry.get("chunk_ids", []))
+        if delete_ids:
+            self.vector_store.delete(ids=delete_ids)
+            print(f"🗑️  Deleted {len(delete_ids)} stale chunks")
+        
+        files = {rel_path: old_files[rel_path] for rel_path in current
+                 if rel_path not in changed}
+        
+        if changed:
+            total = self.add_chunks_in_batches(
+                self.iter_file_chunks({rel_path: current[rel_path] for rel_path in changed},
+                                      chunk_size, chunk_overlap, workers, files),
+                batch_size
+            )
+            print(f"✅ Upserted {total} chunks")
+            self.print_embedding_stats()
+        
+        self.vector_store.persist()
+        self.save_manifest(files, chunk_size, chunk_overlap)
+        print(f"✅ Vector database synced at {self.vector_db_path}")
+        
+        if changed or delete_ids or not self.bm25_path.exists():
+            self.build_bm25_index()
+        
+    def _open_vector_store(self):
+        """Open (or create) the persistent collection without logging"""
+        from langchain.vectorstores import Chroma
+
+        collection_metadata = None
+        if self.hnsw_params:
+            # Only applied when the collection is created
+            collection_metadata = {"hnsw:space": "cosine"}
+            for key, chroma_key in (("M", "hnsw:M"),
+                                    ("ef_construction", "hnsw:construction_ef"),
+                                    ("ef_search", "hnsw:search_ef")):
+                if key in self.hnsw_params:
+                    collection_metadata[chroma_key] = self.hnsw_params[key]
         self.vector_store = Chroma(
             persist_directory=str(self.vector_db_path),
             embedding_function=self.embeddings,
-            collection_name="bloomwatch_agriculture"
+            collection_name="bloomwatch_agriculture",
+            collection_metadata=collection_metadata
         )
+        return self.vector_store
+        
+    def load_existing_vector_store(self):
+        """
+        Load an existing vector database
+        """
+        print(f"📂 Loading existing vector database from {self.vector_db_path}")
+        
+        self._open_vector_store()
         
         print("✅ Vector database loaded successfully")
         return self.vector_store
+    
+    def search(self, query: str, k: int = 4,
+               farm_crop: Optional[str] = None,
+               metadata_filter: Optional[Dict] = None) -> List:
+        """
+        Similarity search restricted to the query's category/crop partition
+        
+        Args:
+            query: The farmer's question (English)
+            k: Number of chunks to return
+            farm_crop: Crop from farm_data, used when the question names none
+            metadata_filter: Explicit {field: value or [values]} filter;
+                             inferred from the query when omitted
+        """
+        if self.vector_store is None:
+            self.load_existing_vector_store()
+        if metadata_filter is None:
+            metadata_filter = infer_query_filter(query, farm_crop)
+        
+        if isinstance(self.vector_store, CompactVectorStore):
+            results = self.vector_store.similarity_search(query, k=k, filter=metadata_filter)
+        else:
+            results = self.vector_store.similarity_search(query, k=k,
+                                                          filter=to_chroma_where(metadata_filter))
+        if not results and metadata_filter:
+            # Nothing in the partition - fall back to the whole collection
+            results = self.vector_store.similarity_search(query, k=k)
+        return results
+    
+    def batch_search(self, queries: List[str], k: int = 4,
+                     farm_crops: Optional[List[Optional[str]]] = None) -> List[List]:
+        """
+        Similarity search for many questions at once (for /chat/batch)
+        
+        Identical questions are searched once, all unique questions are
+        embedded in a single batched call, and questions sharing a
+        category/crop partition are searched together.
+        
+        Args:
+            queries: The farmers' questions (English)
+            k: Number of chunks per question
+            farm_crops: Optional crop from farm_data per question
+        
+        Returns:
+            Chunks for each question, in the order of queries
+        """
+        if self.vector_store is None:
+            self.load_existing_vector_store()
+        farm_crops = farm_crops or [None] * len(queries)
+        
+        # Deduplicate on (question, crop) - the only inputs that change retrieval
+        unique: Dict[Tuple[str, Optional[str]], int] = {}
+        positions = [unique.setdefault((query, crop), len(unique))
+                     for query, crop in zip(queries, farm_crops)]
+        unique_queries = [query for query, _ in unique]
+        vectors = self.embeddings.embed_documents(unique_queries)
+        
+        groups: Dict[str, List[int]] = {}
+        filters: Dict[str, Dict] = {}
+        for number, (query, crop) in enumerate(unique):
+            metadata_filter = infer_query_filter(query, crop)
+            group_key = json.dumps(metadata_filter, sort_keys=True)
+            groups.setdefault(group_key, []).append(number)
+            filters[group_key] = metadata_filter
+        
+        results: List[List] = [[] for _ in unique_queries]
+        for group_key, numbers in groups.items():
+            group_vectors = [vectors[n] for n in numbers]
+            for n, docs in zip(numbers, self._search_vectors(group_vectors, k, filters[group_key])):
+                results[n] = docs
+        
+        # Empty partitions fall back to the whole collection
+        empty = [n for n, docs in enumerate(results) if not docs]
+        if empty:
+            for n, docs in zip(empty, self._search_vectors([vectors[n] for n in empty], k)):
+                results[n] = docs
+        
+        print(f"🔎 Batch search: {len(queries)} queries, {len(unique_queries)} unique, "
+              f"{len(groups)} partitions")
+        return [results[position] for position in positions]
+    
+    def _search_vectors(self, vectors: List[List[float]], k: int,
+                        metadata_filter: Optional[Dict] = None) -> List[List]:
+        """One batched vector search on either store"""
+        if isinstance(self.vector_store, CompactVectorStore):
+            hits = self.vector_store.search_vectors(vectors, k=k, filter=metadata_filter or None)
+            return [[self.vector_store.get_document(i) for i, _ in query_hits]
+                    for query_hits in hits]
+        
+        response = self.vector_store._collection.query(
+            query_embeddings=vectors,
+            n_results=k,
+            where=to_chroma_where(metadata_filter),
+            include=["documents", "metadatas"]
+        )
+        return [
+            [Document(page_content=text, metadata=metadata or {})
+             for text, metadata in zip(texts, metadatas)]
+            for texts, metadatas in zip(response["documents"], response["metadatas"])
+        ]
+    
+    def build_bm25_index(self) -> BM25Index:
+        """
+        Build the BM25 inverted index from the chunks in the vector database
+        and persist it next to it
+        """
+        if self.vector_store is None:
+            self._open_vector_store()
+        
+        print(f"\n🔤 Building BM25 index...")
+        data = self.vector_store.get(include=["documents", "metadatas"])
+        self.bm25_index = BM25Index.build(str(self.bm25_path), data["documents"], data["metadatas"])
+        print(f"✅ BM25 index saved to {self.bm25_path} "
+              f"({len(self.bm25_index)} chunks, {len(self.bm25_index.vocab)} terms)")
+        return self.bm25_index
+    
+    def load_hybrid_retriever(self, k: int = 4, dense_k: int = 8,
+                              lexical_k: int = 20,
+                              auto_filter: bool = True,
+                              reranker=None,
+                              rerank_candidates: int = 12) -> HybridRetriever:
+        """
+        Retriever combining dense search on the loaded vector store with BM25
+        
+        Args:
+            k: Chunks returned after reciprocal-rank fusion
+            dense_k: Candidates taken from the vector store
+            lexical_k: Candidates taken from the BM25 index
+            auto_filter: Restrict each query to the category/crop partition
+                         it mentions (see chunk_metadata.infer_query_filter)
+            reranker: Optional CrossEncoderReranker; fused candidates are
+                      reranked and only the best k are returned
+            rerank_candidates: Fused chunks handed to the reranker
+        """
+        if self.vector_store is None:
+            self.load_existing_vector_store()
+        if self.bm25_index is None:
+            self.bm25_index = BM25Index(str(self.bm25_path))
+        return HybridRetriever(vector_store=self.vector_store, bm25_index=self.bm25_index,
+                               k=k, dense_k=dense_k, lexical_k=lexical_k,
+                               auto_filter=auto_filter, reranker=reranker,
+                               rerank_candidates=rerank_candidates)
+    
+    def export_compact_store(self, compact_path: str = "./vector_db_compact",
+                             pq_subvectors: Optional[int] = None,
+                             ann: Optional[str] = None,
+                             ann_params: Optional[Dict] = None) -> CompactVectorStore:
+        """
+        Convert the Chroma collection into a compact memory-mapped store
+        
+        Args:
+            compact_path: Folder for the compact store
+            pq_subvectors: Also store product-quantized codes with this many
+                           sub-vectors (must divide the embedding dimension)
+            ann: Also build an approximate nearest-neighbour index, 'ivf' or 'hnsw'
+            ann_params: Build parameters for it (nlist, nprobe / M, ef_construction, ef_search)
+        """
+        if self.vector_store is None:
+            self.load_existing_vector_store()
+        
+        print(f"\n📦 Exporting compact vector store to {compact_path}...")
+        store = CompactVectorStore.from_chroma(
+            self.vector_store, compact_path, self.embeddings,
+            pq_subvectors=pq_subvectors,
+            model_id=self.embedding_engine.model_id
+        )
+        print(f"✅ Compact store written: {len(store)} chunks "
+              f"({'PQ ' + str(pq_subvectors) + ' + ' if pq_subvectors else ''}float16)")
+        if ann:
+            store.build_ann_index(ann, **(ann_params or {}))
+            print(f"✅ {ann.upper()} index built over {len(store)} chunks")
+        return store
+    
+    def load_compact_store(self, compact_path: str = "./vector_db_compact",
+                           ann_params: Optional[Dict] = None) -> CompactVectorStore:
+        """
+        Memory-map a compact store written by export_compact_store
+        
+        Args:
+            compact_path: Folder of the compact store
+            ann_params: Query-time ANN settings, e.g. {'nprobe': 16} or {'ef_search': 128}
+        """
+        print(f"📂 Loading compact vector store from {compact_path}")
+        self.vector_store = CompactVectorStore(compact_path, self.embeddings)
+        if self.vector_store.ann_index is not None:
+            self.vector_store.ann_index.set_params(**(ann_params or {}))
+            print(f"⚡ Using {self.vector_store.ann_index.kind.upper()} index")
+        if self.vector_store.header.get("model_id") != self.embedding_engine.model_id:
+            print(f"⚠️  Compact store was built with {self.vector_store.header.get('model_id')}, "
+                  f"queries use {self.embedding_engine.model_id}")
+        print(f"✅ Compact store loaded ({len(self.vector_store)} chunks)")
+        return self.vector_store
 
 
 # Usage Example
@@ -180,5 +773,27 @@ if __name__ == "__main__":
     # Process all documents (run this once when you add new documents)
     processor.process_all(chunk_size=1000, chunk_overlap=200)
     
+    # Later refreshes only re-embed new/changed files:
+    # processor.process_all(chunk_size=1000, chunk_overlap=200, incremental=True)
+    
+    # Search only the partition a question is about (category + crop):
+    # docs = processor.search("What NPK ratio should I use for cotton?", k=4)
+    
+    # Hybrid BM25 + dense retrieval for exact terms (crop/pest names, NPK ratios):
+    # retriever = processor.load_hybrid_retriever(k=4)
+    # docs = retriever.get_relevant_documents("NPK 19:19:19 for COTTON")
+    
+    # Rerank fused candidates with a cross-encoder, keeping the best 3 for the prompt:
+    # from reranker import CrossEncoderReranker
+    # retriever = processor.load_hybrid_retriever(k=3, reranker=CrossEncoderReranker(top_n=3))
+    
+    # Compact float16 store for serving (memory-mapped, shared across workers):
+    # processor.export_compact_store("./vector_db_compact", pq_subvectors=48)
+    # vector_store = processor.load_compact_store("./vector_db_compact")
+    
+    # Approximate nearest-neighbour index for very large corpora:
+    # processor.export_compact_store("./vector_db_compact", ann="ivf", ann_params={"nprobe": 8})
+    # vector_store = processor.load_compact_store("./vector_db_compact", ann_params={"nprobe": 16})
+    
     # To load existing database later:
     # vector_store = processor.load
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+embedding_cache.py
+Persistent on-disk embedding cache for the BloomWatch chatbot
+Shared by document ingestion and query-time embedding
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed cache of embedding vectors keyed by
+    (model name, normalize flag, chunk text hash), with LRU eviction
+    """
+
+    def __init__(self,
+                 cache_path: str = "./embedding_cache.sqlite",
+                 max_entries: int = 500_000):
+        """
+        Initialize the embedding cache
+
+        Args:
+            cache_path: SQLite file holding the cached vectors
+            max_entries: Size cap; least recently used vectors are evicted beyond it
+        """
+        self.cache_path = Path(cache_path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+        # Running row count, so inserts don't scan the table to check the cap
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._puts = 0
+
+    @staticmethod
+    def make_key(model_name: str, normalize: bool, text: str) -> str:
+        """Cache key for one piece of text under a given model configuration"""
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_name}|{int(normalize)}|{text_hash}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up cached vectors and mark them as recently used
+
+        Args:
+            keys: Cache keys from make_key
+
+        Returns:
+            Mapping of key -> vector for the keys that were cached
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """
+        Store vectors and evict the least recently used ones if over the cap
+
+        Args:
+            items: Mapping of key -> vector
+        """
+        if not items:
+            return
+        now = time.time()
+        keys = list(items)
+        with self._lock:
+            # Replaced keys don't grow the table (primary key lookups only)
+            existing = 0
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                existing += self._conn.execute(
+                    f"SELECT COUNT(*) FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                 for key, vector in items.items()]
+            )
+            self._count += len(keys) - existing
+            self._puts += 1
+            if self._puts % 1000 == 0:
+                # Other processes may share the file; resync now and then
+                self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+                self._count -= overflow
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every cached vector"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._count = 0
+
+    def stats(self) -> Dict:
+        """Hit/miss statistics for this process plus the current cache size"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        """Close the underlying SQLite connection"""
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings wrapper that serves vectors from an EmbeddingCache
+    and only sends cache misses to the underlying model
+    """
+
+    def __init__(self,
+                 embeddings: Embeddings,
+                 cache: EmbeddingCache,
+                 model_name: str,
+                 normalize: bool = True):
+        """
+        Args:
+            embeddings: The real embedding model (e.g. HuggingFaceEmbeddings)
+            cache: Shared on-disk cache
+            model_name: Model identifier, part of the cache key
+            normalize: Whether the model normalizes vectors, part of the cache key
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        self.normalize = normalize
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.cache.make_key(self.model_name, self.normalize, t) for t in texts]
+        cached = self.cache.get_many(keys)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_items = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(new_items)
+            cached.update(new_items)
+
+        return [list(cached[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self.cache.make_key(self.model_name, self.normalize, text)
+        cached = self.cache.get_many([key])
+        if key in cached:
+            return cached[key]
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many({key: vector})
+        return vector
+
+    def stats(self) -> Dict:
+        """Cache statistics (see EmbeddingCache.stats)"""
+        return self.cache.stats()
@@ -0,0 +1,390 @@
+"""
+embedding_engine.py
+Batched, multi-core sentence-transformer embedding engine
+Shared by the document processor (ingestion) and the chat service (queries)
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+# torch and sentence_transformers are imported when the model loads, so
+# importing this module stays cheap for the API's cold start
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+
+# Fixed query set for ONNX/PyTorch parity checks
+PARITY_QUERIES = [
+    "What is NDVI and why is it important for farmers?",
+    "My NDVI is 0.45. What does this mean?",
+    "How much nitrogen fertilizer for wheat?",
+    "What NPK ratio should I use for cotton in black soil?",
+    "How do I identify and control whitefly in cotton?",
+    "Best irrigation schedule for cotton?",
+    "What are signs of pest infestation?",
+    "Which crop is best for black soil in Maharashtra?",
+    "How does high land surface temperature affect flowering?",
+    "What EVI values indicate healthy sugarcane?"
+]
+
+
+def _transformer_output(model):
+    """Wraps a HuggingFace model so ONNX export sees positional inputs"""
+    import torch
+
+    class _TransformerOutput(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            return self.model(input_ids=input_ids,
+                              attention_mask=attention_mask,
+                              token_type_ids=token_type_ids).last_hidden_state
+
+    return _TransformerOutput()
+
+
+class OnnxSentenceEncoder:
+    """
+    Runs a sentence-transformer's transformer through ONNX Runtime
+    (optionally int8 dynamic-quantized) and applies the same pooling
+    """
+
+    def __init__(self,
+                 model: "SentenceTransformer",
+                 model_name: str,
+                 onnx_dir: str = "./onnx_models",
+                 quantize: bool = False,
+                 num_threads: Optional[int] = None):
+        """
+        Export (once) and load the ONNX model
+
+        Args:
+            model: Loaded SentenceTransformer (provides weights, tokenizer and pooling)
+            model_name: Model identifier, used for the export folder name
+            onnx_dir: Folder where exported models are kept
+            quantize: Use dynamic int8 quantized weights
+            num_threads: ONNX Runtime intra-op threads (None = runtime default)
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("The ONNX backend needs onnxruntime: pip install onnxruntime")
+
+        self.tokenizer = model.tokenizer
+        self.max_seq_length = model.max_seq_length
+        pooling = model[1]
+        self.pooling = "cls" if getattr(pooling, "pooling_mode_cls_token", False) else "mean"
+
+        export_dir = Path(onnx_dir) / model_name.replace("/", "__")
+        self.model_path = self._export(model, export_dir, quantize)
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(self.model_path), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def _export(self, model: "SentenceTransformer", export_dir: Path, quantize: bool) -> Path:
+        """Export the transformer to ONNX (and quantize it) unless already done"""
+        import torch
+
+        export_dir.mkdir(parents=True, exist_ok=True)
+        onnx_path = export_dir / "model.onnx"
+
+        if not onnx_path.exists():
+            print(f"📦 Exporting embedding model to ONNX: {onnx_path}")
+            sample = self.tokenizer(["BloomWatch ONNX export"], return_tensors="pt")
+            input_names = ["input_ids", "attention_mask"]
+            if "token_type_ids" in sample:
+                input_names.append("token_type_ids")
+            dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+            dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+            wrapper = _transformer_output(model[0].auto_model).eval()
+            with torch.no_grad():
+                torch.onnx.export(
+                    wrapper,
+                    tuple(sample[name] for name in input_names),
+                    str(onnx_path),
+                    input_names=input_names,
+                    output_names=["last_hidden_state"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=14
+                )
+
+        if not quantize:
+            return onnx_path
+
+        quantized_path = export_dir / "model.int8.onnx"
+        if not quantized_path.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            print(f"📦 Quantizing embedding model to int8: {quantized_path}")
+            quantize_dynamic(str(onnx_path), str(quantized_path), weight_type=QuantType.QInt8)
+        return quantized_path
+
+    def encode(self, texts: List[str], batch_size: int = 64, normalize: bool = True) -> np.ndarray:
+        """Encode texts (assumed already length-sorted) into a float32 matrix"""
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(texts[start:start + batch_size], padding=True,
+                                   truncation=True, max_length=self.max_seq_length,
+                                   return_tensors="np")
+            feed = {name: batch[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feed)[0]
+
+            if self.pooling == "cls":
+                vectors = hidden[:, 0]
+            else:
+                mask = feed["attention_mask"][..., None].astype(np.float32)
+                vectors = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+            if normalize:
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                vectors = vectors / np.clip(norms, 1e-12, None)
+            outputs.append(vectors.astype(np.float32))
+        return np.concatenate(outputs)
+
+
+class BloomWatchEmbeddingEngine(Embeddings):
+    """
+    LangChain-compatible embedding engine with explicit batch size,
+    torch thread count, optional multi-process encoding and
+    length-sorted batching. Runs on PyTorch or ONNX Runtime.
+    """
+
+    def __init__(self,
+                 model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 device: str = "cpu",
+                 batch_size: int = 64,
+                 num_threads: Optional[int] = None,
+                 num_processes: int = 0,
+                 normalize: bool = True,
+                 backend: str = "torch",
+                 quantize: bool = False,
+                 onnx_dir: str = "./onnx_models",
+                 lazy: bool = False):
+        """
+        Initialize the embedding engine
+
+        Args:
+            model_name: HuggingFace sentence-transformer model
+            device: 'cpu' or 'cuda'
+            batch_size: Texts per forward pass
+            num_threads: torch intra-op threads in this process (None = torch default)
+            num_processes: Worker processes for large encode jobs (0 = single process)
+            normalize: L2-normalize embeddings
+            backend: 'torch' or 'onnx' (ONNX Runtime on CPU)
+            quantize: With the ONNX backend, use dynamic int8 quantized weights
+            onnx_dir: Folder for exported ONNX models
+            lazy: Defer loading the model until the first encode() or load()
+        """
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"Unknown embedding backend: {backend}")
+
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.num_processes = num_processes
+        self.normalize = normalize
+        self.backend = backend
+        self.quantize = quantize
+        self.onnx_dir = onnx_dir
+        # Identifies the exact vectors produced, e.g. for cache keys
+        backend_label = backend + ("-int8" if backend == "onnx" and quantize else "")
+        self.model_id = model_name if backend == "torch" else f"{model_name}@{backend_label}"
+
+        self._model = None
+        self._pool = None
+        self._onnx = None
+        self.load_seconds = 0.0
+
+        self.total_texts = 0
+        self.total_seconds = 0.0
+
+        if not lazy:
+            self.load()
+
+    def load(self):
+        """Load the sentence-transformer (and ONNX session); safe to call twice"""
+        if self._model is not None:
+            return
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        start = time.perf_counter()
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        model = SentenceTransformer(self.model_name, device=self.device)
+        if self.backend == "onnx":
+            self._onnx = OnnxSentenceEncoder(model, self.model_name, self.onnx_dir,
+                                             quantize=self.quantize, num_threads=self.num_threads)
+        self._model = model
+        self.load_seconds = time.perf_counter() - start
+
+    @property
+    def model(self) -> "SentenceTransformer":
+        self.load()
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _start_pool(self):
+        """Start the multi-process pool, splitting CPU threads evenly between workers"""
+        threads_per_worker = max(1, (os.cpu_count() or 1) // self.num_processes)
+        previous = os.environ.get("OMP_NUM_THREADS")
+        # Spawned workers read this when torch initialises
+        os.environ["OMP_NUM_THREADS"] = str(threads_per_worker)
+        try:
+            self._pool = self.model.start_multi_process_pool(
+                target_devices=[self.device] * self.num_processes
+            )
+        finally:
+            if previous is None:
+                os.environ.pop("OMP_NUM_THREADS", None)
+            else:
+                os.environ["OMP_NUM_THREADS"] = previous
+        print(f"⚙️  Started {self.num_processes} embedding workers "
+              f"({threads_per_worker} threads each)")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts into a float32 matrix, one row per text
+
+        Texts are sorted by length before batching so each batch pads to a
+        similar length, then restored to input order.
+        """
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        self.load()
+        start = time.perf_counter()
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        sorted_texts = [texts[i] for i in order]
+
+        use_pool = (self._onnx is None and self.num_processes > 1
+                    and len(texts) >= self.batch_size * self.num_processes)
+        if self._onnx is not None:
+            vectors = self._onnx.encode(sorted_texts, self.batch_size, self.normalize)
+        elif use_pool:
+            if self._pool is None:
+                self._start_pool()
+            vectors = self.model.encode_multi_process(
+                sorted_texts, self._pool, batch_size=self.batch_size,
+                chunk_size=max(self.batch_size, len(texts) // (self.num_processes * 4))
+            )
+            if self.normalize:
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                vectors = vectors / np.clip(norms, 1e-12, None)
+        else:
+            vectors = self.model.encode(
+                sorted_texts,
+                batch_size=self.batch_size,
+                normalize_embeddings=self.normalize,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+
+        result = np.empty_like(vectors, dtype=np.float32)
+        result[order] = vectors
+
+        self.total_texts += len(texts)
+        self.total_seconds += time.perf_counter() - start
+        return result
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    def stats(self) -> Dict:
+        """Throughput since startup"""
+        return {
+            "model": self.model_id,
+            "device": self.device,
+            "batch_size": self.batch_size,
+            "num_processes": self.num_processes,
+            "load_seconds": round(self.load_seconds, 3),
+            "texts_embedded": self.total_texts,
+            "seconds": round(self.total_seconds, 3),
+            "chunks_per_second": (self.total_texts / self.total_seconds
+                                  if self.total_seconds else 0.0)
+        }
+
+    def close(self):
+        """Stop the multi-process pool, if one was started"""
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+
+def check_onnx_parity(corpus: List[str],
+                      queries: List[str] = PARITY_QUERIES,
+                      model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                      quantize: bool = True,
+                      k: int = 5) -> Dict:
+    """
+    Compare ONNX Runtime embeddings against the PyTorch reference
+
+    Args:
+        corpus: Chunk texts to retrieve from (e.g. the knowledge base)
+        queries: Fixed query set
+        model_name: Sentence-transformer model
+        quantize: Check the int8 quantized ONNX model
+        k: Top-k used for retrieval overlap
+
+    Returns:
+        Cosine agreement, top-k overlap and per-query latency of both backends
+    """
+    reference = BloomWatchEmbeddingEngine(model_name, backend="torch")
+    candidate = BloomWatchEmbeddingEngine(model_name, backend="onnx", quantize=quantize)
+
+    texts = list(queries) + list(corpus)
+    ref_vectors = reference.encode(texts)
+    cand_vectors = candidate.encode(texts)
+    cosines = (ref_vectors * cand_vectors).sum(axis=1)
+
+    k = min(k, len(corpus))
+    n = len(queries)
+    ref_top = np.argsort(-ref_vectors[:n] @ ref_vectors[n:].T, axis=1)[:, :k]
+    cand_top = np.argsort(-cand_vectors[:n] @ cand_vectors[n:].T, axis=1)[:, :k]
+    overlaps = [len(set(r) & set(c)) / k for r, c in zip(ref_top, cand_top)]
+
+    def query_latency_ms(engine):
+        start = time.perf_counter()
+        for query in queries:
+            engine.embed_query(query)
+        return (time.perf_counter() - start) * 1000 / len(queries)
+
+    return {
+        "model": candidate.model_id,
+        "cosine_mean": float(cosines.mean()),
+        "cosine_min": float(cosines.min()),
+        f"top{k}_overlap": float(np.mean(overlaps)),
+        "torch_query_ms": query_latency_ms(reference),
+        "onnx_query_ms": query_latency_ms(candidate)
+    }
+
+
+# Usage Example
+if __name__ == "__main__":
+    # Parity check of the int8 ONNX backend on the knowledge base paragraphs
+    corpus = []
+    for path in sorted(Path("./knowledge_base").glob("**/*.txt")):
+        text = path.read_text(encoding="utf-8")
+        corpus.extend(p.strip() for p in text.split("\n\n") if p.strip())
+
+    report = check_onnx_parity(corpus, quantize=True)
+    for key, value in report.items():
+        print(f"{key}: {value}")
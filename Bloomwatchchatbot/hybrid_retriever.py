@@ -0,0 +1,254 @@
+"""
+hybrid_retriever.py
+BM25 inverted index + dense vector retrieval fused with reciprocal-rank fusion
+Catches exact agricultural terms (crop/pest names, NPK ratios, NDVI ranges)
+that dense retrieval alone often misses
+"""
+
+import json
+import math
+import re
+import shutil
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain.docstore.document import Document
+from langchain.schema import BaseRetriever
+
+from chunk_metadata import infer_query_filter, to_chroma_where
+from compact_store import CompactVectorStore, RecordReader, swap_directory, write_records
+
+# Terms like '19:19:19' or '0.4-0.6' are kept whole, and their parts ('0.4', '0.6') are indexed too
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.:/\-][a-z0-9]+)*")
+_PART_RE = re.compile(r"[:/\-]")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how i in is it its my of on or
+should that the their this to was what when where which why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens, keeping compound numeric/ratio terms and their parts"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = _PART_RE.split(token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p and p not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index stored as flat numpy arrays
+
+    Layout of the index folder:
+        vocab.json          - term -> [start, end) range in the postings arrays
+        postings_docs.npy   - int32 document numbers, grouped by term
+        postings_tf.npy     - float32 term frequencies (aligned with postings_docs)
+        doc_lengths.npy     - float32 token count per document
+        records.bin / offsets.npy - chunk texts + metadata (see compact_store)
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        """
+        Open a persisted index
+
+        Args:
+            path: Index folder written by BM25Index.build
+            k1: Term-frequency saturation
+            b: Document-length normalisation
+        """
+        # Resolved once, so every file comes from the same swapped-in version
+        self.path = Path(path).resolve()
+        self.k1 = k1
+        self.b = b
+
+        with open(self.path / "vocab.json", "r", encoding="utf-8") as f:
+            self.vocab: Dict[str, List[int]] = json.load(f)
+        self.postings_docs = np.load(self.path / "postings_docs.npy", mmap_mode="r")
+        self.postings_tf = np.load(self.path / "postings_tf.npy", mmap_mode="r")
+        self.doc_lengths = np.load(self.path / "doc_lengths.npy")
+        self.records = RecordReader(self.path)
+
+        self.num_docs = len(self.doc_lengths)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if self.num_docs else 0.0
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    @classmethod
+    def build(cls, path: str, texts: List[str], metadatas: List[Dict]) -> "BM25Index":
+        """
+        Build and persist an index, replacing any previous one atomically
+
+        Args:
+            path: Destination folder
+            texts: Chunk texts
+            metadatas: Chunk metadata dicts (aligned with texts)
+        """
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        for doc_number, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths[doc_number] = sum(counts.values())
+            for term, tf in counts.items():
+                postings[term].append((doc_number, tf))
+
+        vocab = {}
+        docs_parts, tf_parts = [], []
+        start = 0
+        for term in sorted(postings):
+            entries = postings[term]
+            docs_parts.append(np.fromiter((d for d, _ in entries), dtype=np.int32, count=len(entries)))
+            tf_parts.append(np.fromiter((t for _, t in entries), dtype=np.float32, count=len(entries)))
+            vocab[term] = [start, start + len(entries)]
+            start += len(entries)
+
+        np.save(tmp_path / "postings_docs.npy",
+                np.concatenate(docs_parts) if docs_parts else np.zeros(0, dtype=np.int32))
+        np.save(tmp_path / "postings_tf.npy",
+                np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.float32))
+        np.save(tmp_path / "doc_lengths.npy", doc_lengths)
+        with open(tmp_path / "vocab.json", "w", encoding="utf-8") as f:
+            json.dump(vocab, f, ensure_ascii=False)
+        write_records(tmp_path, texts, metadatas)
+
+        swap_directory(tmp_path, path)
+
+        return cls(str(path))
+
+    def search(self, query: str, k: int = 20,
+               metadata_filter: Optional[Dict] = None) -> List[Tuple[int, float]]:
+        """
+        Score documents containing any query term
+
+        Args:
+            query: Query text
+            k: Number of results
+            metadata_filter: Optional {field: value or [values]} pre-filter
+                             on category / crop
+
+        Returns:
+            (document number, BM25 score) pairs, best first
+        """
+        if not self.num_docs:
+            return []
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            span = self.vocab.get(term)
+            if span is None:
+                continue
+            docs = self.postings_docs[span[0]:span[1]]
+            tf = self.postings_tf[span[0]:span[1]]
+            df = span[1] - span[0]
+            idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avg_doc_length)
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        mask = self.records.facet_mask(metadata_filter)
+        if mask is not None:
+            scores[~mask] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(int(i), float(scores[i])) for i in hits]
+
+    def get_document(self, doc_number: int) -> Document:
+        return self.records[doc_number]
+
+
+def _doc_key(doc: Document) -> str:
+    """Identity of a chunk across retrievers"""
+    chunk_id = doc.metadata.get("chunk_id")
+    if chunk_id:
+        return chunk_id
+    return f"{doc.metadata.get('source', '')}::{hash(doc.page_content)}"
+
+
+def reciprocal_rank_fusion(result_lists: Iterable[List[Document]],
+                           k: int = 4, rrf_k: int = 60,
+                           weights: Optional[List[float]] = None) -> List[Document]:
+    """
+    Fuse ranked document lists: score(d) = sum_i w_i / (rrf_k + rank_i(d))
+
+    Args:
+        result_lists: Ranked lists, best first
+        k: Number of fused documents to return
+        rrf_k: RRF damping constant (60 in the original paper)
+        weights: Optional per-list weights
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    docs: Dict[str, Document] = {}
+    for list_number, results in enumerate(result_lists):
+        weight = weights[list_number] if weights else 1.0
+        for rank, doc in enumerate(results, start=1):
+            key = _doc_key(doc)
+            scores[key] += weight / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    LangChain retriever fusing dense vector search with BM25 via RRF,
+    optionally restricted to a category / crop partition and reranked
+    by a cross-encoder
+    """
+
+    vector_store: Any
+    bm25_index: Any
+    k: int = 4
+    dense_k: int = 8
+    lexical_k: int = 20
+    rrf_k: int = 60
+    metadata_filter: Optional[Dict] = None
+    auto_filter: bool = False
+    reranker: Any = None
+    rerank_candidates: int = 12
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def dense_search(self, query: str, k: int,
+                     metadata_filter: Optional[Dict] = None) -> List[Document]:
+        """Dense search on either a Chroma or a compact store"""
+        if isinstance(self.vector_store, CompactVectorStore):
+            return self.vector_store.similarity_search(query, k=k, filter=metadata_filter)
+        return self.vector_store.similarity_search(query, k=k,
+                                                   filter=to_chroma_where(metadata_filter))
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        metadata_filter = self.metadata_filter
+        if metadata_filter is None and self.auto_filter:
+            metadata_filter = infer_query_filter(query)
+
+        dense = self.dense_search(query, self.dense_k, metadata_filter)
+        lexical = [self.bm25_index.get_document(i)
+                   for i, _ in self.bm25_index.search(query, k=self.lexical_k,
+                                                      metadata_filter=metadata_filter)]
+        if metadata_filter and not dense and not lexical:
+            # Nothing in the partition - fall back to the whole collection
+            dense = self.dense_search(query, self.dense_k)
+            lexical = [self.bm25_index.get_document(i)
+                       for i, _ in self.bm25_index.search(query, k=self.lexical_k)]
+        if self.reranker is None:
+            return reciprocal_rank_fusion([dense, lexical], k=self.k, rrf_k=self.rrf_k)
+        candidates = reciprocal_rank_fusion([dense, lexical], k=max(self.k, self.rerank_candidates),
+                                            rrf_k=self.rrf_k)
+        return self.reranker.rerank(query, candidates, top_n=self.k)
@@ -0,0 +1,205 @@
+"""
+reranker.py
+Cross-encoder reranking of retrieved chunks before generation
+Scores (query, chunk) pairs in batches, caches pair scores, stops early once
+enough confident chunks are found, and keeps only the best N for the prompt
+"""
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def _chunk_key(doc) -> str:
+    # The score depends on the text alone; a chunk_id stays the same when an
+    # edited file is re-indexed, so it must not key the cache
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """
+    Reranks retrieved chunks with a small cross-encoder
+
+    Chunks are scored in retrieval order, batch by batch. Once top_n chunks
+    have scored above early_exit_score the remaining candidates are skipped,
+    since retrieval already ranked them lower.
+    """
+
+    def __init__(self,
+                 model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 device: str = "cpu",
+                 top_n: int = 3,
+                 batch_size: int = 16,
+                 min_score: Optional[float] = None,
+                 early_exit_score: Optional[float] = None,
+                 cache_size: int = 50000,
+                 max_length: int = 512):
+        """
+        Initialize the reranker (the model loads on first use)
+
+        Args:
+            model_name: sentence-transformers CrossEncoder model
+            device: 'cpu' or 'cuda'
+            top_n: Chunks passed on to generation
+            batch_size: Pairs per forward pass
+            min_score: Drop chunks scoring below this (None keeps top_n regardless)
+            early_exit_score: Stop scoring once top_n chunks score at least this
+            cache_size: Cached (query, chunk) scores before LRU eviction
+            max_length: Max tokens per (query, chunk) pair
+        """
+        self.model_name = model_name
+        self.device = device
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.min_score = min_score
+        self.early_exit_score = early_exit_score
+        self.cache_size = cache_size
+        self.max_length = max_length
+
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self.calls = 0
+        self.pairs_scored = 0
+        self.cache_hits = 0
+        self.early_exits = 0
+        self.chunks_in = 0
+        self.chunks_out = 0
+        self._latencies_ms = deque(maxlen=1000)
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    print(f"🎯 Loading reranker: {self.model_name}")
+                    self._model = CrossEncoder(self.model_name, device=self.device,
+                                               max_length=self.max_length)
+        return self._model
+
+    def _pair_key(self, query: str, doc) -> str:
+        return hashlib.sha1(f"{self.model_name}|{query}|{_chunk_key(doc)}"
+                            .encode("utf-8")).hexdigest()
+
+    def _cached(self, key: str) -> Optional[float]:
+        with self._cache_lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _store(self, keys: List[str], scores: np.ndarray):
+        with self._cache_lock:
+            for key, score in zip(keys, scores):
+                self._cache[key] = float(score)
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def score(self, query: str, docs: List, early_exit: bool = True) -> List[Optional[float]]:
+        """
+        Cross-encoder scores for each chunk (None for chunks skipped by early exit)
+        """
+        # Keyed on the text that is scored; only whitespace, which the
+        # tokenizer ignores, is collapsed
+        query = " ".join(query.split())
+        keys = [self._pair_key(query, doc) for doc in docs]
+        scores: List[Optional[float]] = [self._cached(key) for key in keys]
+        self.cache_hits += sum(score is not None for score in scores)
+
+        def confident() -> bool:
+            if not early_exit or self.early_exit_score is None:
+                return False
+            return sum(s is not None and s >= self.early_exit_score for s in scores) >= self.top_n
+
+        pending = [i for i, s in enumerate(scores) if s is None]
+        for start in range(0, len(pending), self.batch_size):
+            if confident():
+                self.early_exits += 1
+                break
+            batch = pending[start:start + self.batch_size]
+            batch_scores = np.asarray(self.model.predict([(query, docs[i].page_content) for i in batch],
+                                                         batch_size=self.batch_size,
+                                                         show_progress_bar=False),
+                                      dtype=np.float32)
+            self._store([keys[i] for i in batch], batch_scores)
+            for i, value in zip(batch, batch_scores):
+                scores[i] = float(value)
+            self.pairs_scored += len(batch)
+        return scores
+
+    def rerank(self, query: str, docs: List, top_n: Optional[int] = None) -> List:
+        """
+        Keep the top_n chunks by cross-encoder score
+
+        Args:
+            query: The farmer's question (English)
+            docs: Retrieved chunks, best first
+            top_n: Override the configured number of chunks to keep
+
+        Returns:
+            Copies of up to top_n chunks, best first, each with
+            metadata['rerank_score'] (the caller's chunks are left untouched)
+        """
+        if not docs:
+            return []
+        start = time.perf_counter()
+        top_n = top_n or self.top_n
+
+        scores = self.score(query, docs)
+        ranked = sorted((i for i, s in enumerate(scores) if s is not None),
+                        key=lambda i: scores[i], reverse=True)
+        if self.min_score is not None:
+            ranked = [i for i in ranked if scores[i] >= self.min_score]
+
+        results = []
+        for i in ranked[:top_n]:
+            doc = copy.copy(docs[i])
+            doc.metadata = {**docs[i].metadata, "rerank_score": round(scores[i], 4)}
+            results.append(doc)
+
+        self.calls += 1
+        self.chunks_in += len(docs)
+        self.chunks_out += len(results)
+        self._latencies_ms.append((time.perf_counter() - start) * 1000)
+        return results
+
+    def stats(self) -> Dict:
+        """Latency and pruning statistics, for the /info endpoint"""
+        latencies = np.asarray(self._latencies_ms) if self._latencies_ms else np.zeros(1)
+        return {
+            "model": self.model_name,
+            "calls": self.calls,
+            "pairs_scored": self.pairs_scored,
+            "cache_hits": self.cache_hits,
+            "early_exits": self.early_exits,
+            "avg_chunks_in": self.chunks_in / self.calls if self.calls else 0.0,
+            "avg_chunks_out": self.chunks_out / self.calls if self.calls else 0.0,
+            "latency_ms_p50": round(float(np.percentile(latencies, 50)), 2),
+            "latency_ms_p95": round(float(np.percentile(latencies, 95)), 2)
+        }
+
+
+# Usage Example
+if __name__ == "__main__":
+    from documentprocessor import BloomWatchDocumentProcessor
+
+    processor = BloomWatchDocumentProcessor()
+    processor.load_existing_vector_store()
+    reranker = CrossEncoderReranker(top_n=3, early_exit_score=5.0)
+
+    query = "What NPK ratio should I use for cotton in black soil?"
+    candidates = processor.search(query, k=12)
+    for _ in range(2):
+        for doc in reranker.rerank(query, list(candidates)):
+            print(f"{doc.metadata['rerank_score']:7.3f}  {doc.metadata.get('section', '')}")
+    print(reranker.stats())
@@ -0,0 +1,267 @@
+"""
+response_cache.py
+Response cache for the /chat endpoint
+Exact tier keyed by (normalized query, language, farm_data digest) and a
+semantic tier that reuses answers to near-identical questions about the same
+crop, topic and values
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from chunk_metadata import infer_query_filter
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+_SPACE_RE = re.compile(r"\s+")
+# Values such as 0.45, 19:19:19 or 12/32/16
+_NUMBER_RE = re.compile(r"\d+(?:[.:/]\d+)*")
+
+
+def normalize_query(query: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace"""
+    return _SPACE_RE.sub(" ", _PUNCTUATION_RE.sub(" ", query.lower())).strip()
+
+
+def farm_data_digest(farm_data: Optional[Dict]) -> str:
+    """Stable digest of the farm_data payload ('' when there is none)"""
+    if not farm_data:
+        return ""
+    payload = json.dumps(farm_data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def cache_partition(query: str, language: str, farm_data: Optional[Dict]) -> str:
+    """
+    Partition a question's answer may be reused in: language, farm_data, the
+    crop / category the question is about and the numbers it gives, so a
+    semantic hit never answers a cotton question with a wheat answer, or
+    'my NDVI is 0.45' with the answer for 0.65
+    """
+    farm_crop = (farm_data or {}).get("crop_type")
+    topic = infer_query_filter(normalize_query(query), str(farm_crop) if farm_crop else None)
+    crop = topic["crop"][0] if "crop" in topic else ""
+    numbers = ",".join(_NUMBER_RE.findall(query))
+    return f"{language}|{farm_data_digest(farm_data)}|{crop}|{topic.get('category', '')}|{numbers}"
+
+
+@dataclass
+class _Entry:
+    response: Dict
+    partition: str
+    slot: int
+    expires_at: float
+    latency_seconds: float
+
+
+class ResponseCache:
+    """
+    TTL + LRU bounded cache of chat responses
+
+    Answers are only reused within the same (language, farm_data, crop,
+    category) partition, and the whole cache is dropped when the vector store is rebuilt.
+    """
+
+    def __init__(self,
+                 embeddings: Optional[Embeddings] = None,
+                 max_entries: int = 1000,
+                 ttl_seconds: float = 6 * 3600,
+                 semantic_distance: float = 0.08,
+                 index_version: Optional[Callable[[], Any]] = None):
+        """
+        Initialize the response cache
+
+        Args:
+            embeddings: Query embedding function for the semantic tier (None disables it)
+            max_entries: Maximum cached responses (least recently used are evicted)
+            ttl_seconds: Time a cached response stays valid
+            semantic_distance: Max cosine distance for a semantic hit
+            index_version: Returns the current vector store version; the cache
+                           is cleared whenever the value changes
+        """
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_distance = semantic_distance
+        self.index_version = index_version
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._vectors: Optional[np.ndarray] = None
+        self._slot_keys = [None] * max_entries
+        self._slot_partitions = np.full(max_entries, -1, dtype=np.int64)
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        # Partition -> id and live entry count; a partition is dropped with its
+        # last entry, ids are never reused
+        self._partition_ids: Dict[str, int] = {}
+        self._partition_sizes: Dict[str, int] = {}
+        self._next_partition_id = 0
+        self._version = index_version() if index_version else None
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.latency_saved_seconds = 0.0
+
+    def _key(self, normalized: str, partition: str) -> str:
+        return hashlib.sha1(f"{partition}|{normalized}".encode("utf-8")).hexdigest()
+
+    def _check_version(self):
+        """Clear everything if the vector store changed (caller holds the lock)"""
+        if self.index_version is None:
+            return
+        version = self.index_version()
+        if version != self._version:
+            self._clear()
+            self._version = version
+
+    def _clear(self):
+        self._entries.clear()
+        self._partition_ids.clear()
+        self._partition_sizes.clear()
+        self._slot_keys = [None] * self.max_entries
+        self._slot_partitions.fill(-1)
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._slot_keys[entry.slot] = None
+        self._slot_partitions[entry.slot] = -1
+        self._free_slots.append(entry.slot)
+        self._partition_sizes[entry.partition] -= 1
+        if not self._partition_sizes[entry.partition]:
+            del self._partition_sizes[entry.partition]
+            del self._partition_ids[entry.partition]
+
+    def _embed(self, normalized: str) -> Optional[np.ndarray]:
+        if self.embeddings is None:
+            return None
+        return np.asarray(self.embeddings.embed_query(normalized), dtype=np.float32)
+
+    def get(self, query: str, language: str = "en",
+            farm_data: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Look up a cached response
+
+        Returns:
+            The cached response dict, or None on a miss
+        """
+        normalized = normalize_query(query)
+        partition = cache_partition(query, language, farm_data)
+        key = self._key(normalized, partition)
+        now = time.time()
+
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                self.latency_saved_seconds += entry.latency_seconds
+                return entry.response
+            if entry is not None:
+                self._remove(key)
+            partition_id = self._partition_ids.get(partition)
+
+        # Semantic tier: nearest cached question in the same partition
+        if partition_id is None or self.embeddings is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        vector = self._embed(normalized)
+        with self._lock:
+            # Re-read: the cache may have been cleared while embedding
+            partition_id = self._partition_ids.get(partition)
+            if self._vectors is not None and partition_id is not None:
+                slots = np.flatnonzero(self._slot_partitions == partition_id)
+                if len(slots):
+                    similarities = self._vectors[slots] @ vector
+                    best = int(np.argmax(similarities))
+                    best_key = self._slot_keys[slots[best]]
+                    entry = self._entries.get(best_key)
+                    if (entry is not None and entry.expires_at > now
+                            and 1 - similarities[best] <= self.semantic_distance):
+                        self._entries.move_to_end(best_key)
+                        self.semantic_hits += 1
+                        self.latency_saved_seconds += entry.latency_seconds
+                        return entry.response
+            self.misses += 1
+        return None
+
+    def put(self, query: str, response: Dict, language: str = "en",
+            farm_data: Optional[Dict] = None, latency_seconds: float = 0.0):
+        """
+        Store a response
+
+        Args:
+            query: The question as asked
+            response: Response dict returned to the client
+            language: Response language
+            farm_data: farm_data sent with the question
+            latency_seconds: Time it took to produce the response (for stats)
+        """
+        normalized = normalize_query(query)
+        partition = cache_partition(query, language, farm_data)
+        key = self._key(normalized, partition)
+        vector = self._embed(normalized)
+
+        with self._lock:
+            self._check_version()
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+            slot = self._free_slots.pop()
+            partition_id = self._partition_ids.get(partition)
+            if partition_id is None:
+                partition_id = self._partition_ids[partition] = self._next_partition_id
+                self._next_partition_id += 1
+            self._partition_sizes[partition] = self._partition_sizes.get(partition, 0) + 1
+            if vector is not None:
+                if self._vectors is None:
+                    self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._vectors[slot] = vector
+            self._slot_keys[slot] = key
+            self._slot_partitions[slot] = partition_id
+            self._entries[key] = _Entry(response, partition, slot,
+                                        time.time() + self.ttl_seconds, latency_seconds)
+
+    def get_or_compute(self, query: str, compute: Callable[[], Dict],
+                       language: str = "en", farm_data: Optional[Dict] = None) -> Dict:
+        """Return a cached response or compute, time and cache a new one"""
+        cached = self.get(query, language, farm_data)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        response = compute()
+        self.put(query, response, language, farm_data, time.perf_counter() - start)
+        return response
+
+    def invalidate(self):
+        """Drop every cached response (e.g. after rebuilding the vector store)"""
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict:
+        """Hit rate and latency saved, for the /info endpoint"""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": ((self.exact_hits + self.semantic_hits) / lookups
+                             if lookups else 0.0),
+                "latency_saved_seconds": round(self.latency_saved_seconds, 3)
+            }
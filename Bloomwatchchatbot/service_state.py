@@ -0,0 +1,215 @@
+"""
+service_state.py
+Lazy model loading, background warm-up and health reporting for the chatbot API
+The API binds immediately; torch / transformers / langchain / chromadb are
+imported inside the component loaders, which run on first use, in a
+background warm-up thread, or once before forking workers
+"""
+
+import gc
+import os
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class _Component:
+    def __init__(self, name: str, loader: Callable[[], Any], required: bool):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.status = PENDING
+        self.value = None
+        self.error: Optional[str] = None
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+
+class ServiceState:
+    """
+    Registry of lazily loaded service components (embeddings, vector store,
+    LLM, translator) with liveness / readiness reporting
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._components: Dict[str, _Component] = {}
+        self._warm_up_thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, loader: Callable[[], Any], required: bool = True):
+        """
+        Register a component
+
+        Args:
+            name: Component name, e.g. 'processor' or 'translator'
+            loader: Builds the component; do heavy imports inside it
+            required: Whether the service is not ready until it is loaded
+        """
+        self._components[name] = _Component(name, loader, required)
+
+    def get(self, name: str) -> Any:
+        """Return a component, loading it now if warm-up has not reached it yet"""
+        component = self._components[name]
+        if component.status == READY:
+            return component.value
+        with component.lock:
+            if component.status != READY:
+                component.status = LOADING
+                start = time.perf_counter()
+                try:
+                    component.value = component.loader()
+                except Exception as e:
+                    component.status = FAILED
+                    component.error = f"{type(e).__name__}: {e}"
+                    raise
+                finally:
+                    component.seconds = time.perf_counter() - start
+                component.status = READY
+                print(f"✅ {name} loaded in {component.seconds:.1f}s")
+        return component.value
+
+    def is_loaded(self, name: str) -> bool:
+        return self._components[name].status == READY
+
+    def load_all(self, names: Optional[Iterable[str]] = None):
+        """Load components in registration order, logging failures"""
+        for name in names or list(self._components):
+            try:
+                self.get(name)
+            except Exception:
+                print(f"❌ Failed to load {name}")
+                traceback.print_exc()
+
+    def start_warm_up(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Load components on a background thread (call from the startup hook)"""
+        if self._warm_up_thread is None:
+            names = list(names) if names is not None else None
+            self._warm_up_thread = threading.Thread(target=self.load_all, args=(names,),
+                                                    name="warm-up", daemon=True)
+            self._warm_up_thread.start()
+            print("🔥 Warming up models in the background...")
+        return self._warm_up_thread
+
+    def preload_for_fork(self, names: Optional[Iterable[str]] = None):
+        """
+        Load components in the master process before workers are forked
+
+        Loaded weights are then shared copy-on-write by every worker.
+        gc.freeze() moves the loaded objects out of the garbage collector's
+        reach, so collections in the workers do not touch (and copy) their pages.
+        """
+        self.load_all(names)
+        gc.collect()
+        gc.freeze()
+        print(f"🧊 Preloaded {sum(c.status == READY for c in self._components.values())} "
+              f"components for forked workers")
+
+    def liveness(self) -> Dict:
+        """The process is up and serving HTTP"""
+        return {
+            "status": "alive",
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1)
+        }
+
+    def readiness(self) -> Dict:
+        """Whether every required component is loaded, with per-component state"""
+        required = [c for c in self._components.values() if c.required]
+        return {
+            "ready": all(c.status == READY for c in required),
+            "components": {
+                c.name: {
+                    "status": c.status,
+                    "required": c.required,
+                    "load_seconds": round(c.seconds, 2),
+                    **({"error": c.error} if c.error else {})
+                }
+                for c in self._components.values()
+            }
+        }
+
+    def add_health_routes(self, app, chatbot_component: str = "chatbot"):
+        """
+        Add /health/live, /health/ready and the existing /health to a FastAPI app
+
+        /health/live never waits for models; /health/ready answers 503 until
+        the required components are loaded (use it for load balancer and
+        rolling-deploy checks).
+        """
+        from fastapi.responses import JSONResponse
+
+        @app.get("/health/live")
+        async def health_live():
+            return self.liveness()
+
+        @app.get("/health/ready")
+        async def health_ready():
+            readiness = self.readiness()
+            return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+        @app.get("/health")
+        async def health():
+            return {
+                "status": "healthy",
+                "chatbot_loaded": (chatbot_component in self._components
+                                   and self.is_loaded(chatbot_component)),
+                "ready": self.readiness()["ready"]
+            }
+
+
+def gunicorn_preload_hooks(state: ServiceState,
+                           names: Optional[List[str]] = None,
+                           threads_per_worker: Optional[int] = None) -> Dict[str, Callable]:
+    """
+    Hooks for a gunicorn config running uvicorn workers with preload_app = True
+
+        # gunicorn_conf.py
+        from main import service_state
+        from service_state import gunicorn_preload_hooks
+        preload_app = True
+        worker_class = "uvicorn.workers.UvicornWorker"
+        globals().update(gunicorn_preload_hooks(service_state))
+
+    Models load once in the master (when_ready) and are shared by all
+    workers. After the fork, each worker limits torch to its share of cores.
+    """
+    def when_ready(server):
+        state.preload_for_fork(names)
+
+    def post_fork(server, worker):
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // max(1, server.cfg.workers))
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+
+    return {"when_ready": when_ready, "post_fork": post_fork}
+
+
+# Usage Example (main.py)
+#
+# service_state = ServiceState()
+#
+# def load_processor():
+#     from documentprocessor import BloomWatchDocumentProcessor
+#     processor = BloomWatchDocumentProcessor(lazy_load=True)
+#     processor.load_existing_vector_store()
+#     processor.embedding_engine.load()
+#     return processor
+#
+# service_state.register("processor", load_processor)
+# service_state.register("chatbot", lambda: BloomWatchChatbot(service_state.get("processor")))
+# service_state.register("translator", load_translator, required=False)
+# service_state.add_health_routes(app)
+#
+# @app.on_event("startup")
+# async def warm_up():
+#     if os.environ.get("BLOOMWATCH_PRELOAD") != "1":
+#         service_state.start_warm_up()
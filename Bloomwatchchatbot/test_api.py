@@ -19,6 +19,23 @@ class BloomWatchAPITester:
         print(f"  {title}")
         print("="*60)
     
+    def wait_until_ready(self, timeout: float = 300) -> bool:
+        """Wait for background model warm-up (/health/ready) to finish"""
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            try:
+                response = requests.get(f"{self.base_url}/health/ready")
+                if response.status_code == 404:
+                    return True  # Server without readiness reporting
+                if response.status_code == 200:
+                    print(f"✅ Server ready after {time.time() - start_time:.1f} seconds")
+                    return True
+            except requests.ConnectionError:
+                pass
+            time.sleep(2)
+        print("❌ Server did not become ready in time")
+        return False
+    
     def test_health_check(self) -> bool:
         """Test if the API is running"""
         self.print_section("🏥 Testing Health Check")
@@ -127,6 +144,69 @@ class BloomWatchAPITester:
             print(f"❌ Error: {e}")
             return False
     
+    def test_streaming_query(self) -> bool:
+        """Test Server-Sent Events streaming of a chat answer"""
+        self.print_section("📡 Testing Streaming Query")
+        
+        payload = {
+            "query": "What is NDVI and why is it important for farmers?",
+            "language": "en"
+        }
+        
+        try:
+            print(f"Query: {payload['query']}")
+            
+            start_time = time.time()
+            response = requests.post(f"{self.base_url}/chat/stream", json=payload, stream=True)
+            if response.status_code == 404:
+                print("⚠️  /chat/stream not available on this server, skipping")
+                return True  # Server without streaming support
+            if response.status_code != 200:
+                print(f"Status Code: {response.status_code}")
+                print("❌ Streaming query test failed!")
+                return False
+            
+            first_event_time = None
+            first_token_time = None
+            tokens = 0
+            final = None
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    if first_event_time is None:
+                        first_event_time = time.time()
+                    if event == "token":
+                        tokens += 1
+                        if first_token_time is None:
+                            first_token_time = time.time()
+                    elif event in ("done", "error"):
+                        final = (event, data)
+            end_time = time.time()
+            
+            if first_event_time is None:
+                print("❌ No events received from the stream!")
+                return False
+            print(f"\nTime to Sources: {first_event_time - start_time:.2f} seconds")
+            if first_token_time:
+                print(f"Time to First Token: {first_token_time - start_time:.2f} seconds")
+            print(f"Total Time: {end_time - start_time:.2f} seconds ({tokens} tokens)")
+            
+            if final and final[0] == "done":
+                print(f"\nAnswer: {final[1]['answer'][:300]}...")
+                print(f"Sources: {', '.join(final[1]['sources'][:2])}")
+                print("✅ Streaming query test passed!")
+                return True
+            else:
+                print("❌ Streaming query test failed!")
+                return False
+                
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return False
+    
     def test_multilingual_hindi(self) -> bool:
         """Test Hindi language support"""
         self.print_section("🌐 Testing Hindi Translation")
@@ -295,10 +375,13 @@ class BloomWatchAPITester:
         print("  🌾 BLOOMWATCH API TEST SUITE")
         print("="*60)
         
+        self.wait_until_ready()
+        
         tests = [
             ("Health Check", self.test_health_check),
             ("Basic Query", self.test_basic_query),
             ("Farm Data Query", self.test_query_with_farm_data),
+            ("Streaming Query", self.test_streaming_query),
             ("Hindi Translation", self.test_multilingual_hindi),
             ("Batch Queries", self.test_batch_queries),
             ("System Info", self.test_system_info),
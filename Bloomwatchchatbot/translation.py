@@ -0,0 +1,242 @@
+"""
+translation.py
+Cached, batched translation for multilingual chat (Hindi / Marathi <-> English)
+Queries are translated to English once, answers are translated sentence by
+sentence in a single batched forward pass, and both are cached so repeated
+advisory content does not pay the seq2seq cost twice
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# (source, target) -> MarianMT checkpoint (sentencepiece tokenizers)
+TRANSLATION_MODELS = {
+    ("hi", "en"): "Helsinki-NLP/opus-mt-hi-en",
+    ("en", "hi"): "Helsinki-NLP/opus-mt-en-hi",
+    ("mr", "en"): "Helsinki-NLP/opus-mt-mr-en",
+    ("en", "mr"): "Helsinki-NLP/opus-mt-en-mr"
+}
+
+# A sentence runs to . ! ? or the Devanagari danda followed by whitespace,
+# or to the end of the line ('0.5 kg' and '19:19:19' stay whole)
+_SENTENCE_RE = re.compile(r"(\S.*?(?:[.!?।]+(?=\s|$)|$))(\s*)", re.MULTILINE)
+
+
+def split_sentences(text: str) -> List[Tuple[str, str]]:
+    """
+    Split text into (sentence, trailing separator) pairs so a translated
+    answer keeps its original punctuation and line breaks
+    """
+    return [(match.group(1), match.group(2)) for match in _SENTENCE_RE.finditer(text)]
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl_seconds"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Tuple, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple, value: str):
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+class BloomWatchTranslator:
+    """
+    Lazily loaded MarianMT translators with query and sentence caches
+    """
+
+    def __init__(self,
+                 models: Optional[Dict[Tuple[str, str], str]] = None,
+                 device: str = "cpu",
+                 batch_size: int = 16,
+                 max_length: int = 512,
+                 cache_size: int = 10000,
+                 ttl_seconds: float = 24 * 3600):
+        """
+        Initialize the translator (models load on first use or warm_up())
+
+        Args:
+            models: (source, target) -> checkpoint, defaults to TRANSLATION_MODELS
+            device: Torch device
+            batch_size: Sentences per generate() call
+            max_length: Max tokens per translated sentence
+            cache_size: Entries per cache (queries, answer sentences)
+            ttl_seconds: Time a cached translation stays valid
+        """
+        self.models = models or TRANSLATION_MODELS
+        self.device = device
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        self.query_cache = TTLCache(cache_size, ttl_seconds)
+        self.sentence_cache = TTLCache(cache_size, ttl_seconds)
+
+        self._loaded: Dict[Tuple[str, str], Tuple] = {}
+        self._load_lock = threading.Lock()
+        self.sentences_translated = 0
+        self.seconds = 0.0
+
+    def supports(self, source: str, target: str) -> bool:
+        return source == target or (source, target) in self.models
+
+    def _get_model(self, source: str, target: str) -> Tuple:
+        pair = (source, target)
+        if pair not in self._loaded:
+            with self._load_lock:
+                if pair not in self._loaded:
+                    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+                    checkpoint = self.models[pair]
+                    print(f"🌐 Loading translation model {checkpoint}...")
+                    tokenizer = AutoTokenizer.from_pretrained(checkpoint)
+                    model = AutoModelForSeq2SeqLM.from_pretrained(checkpoint).to(self.device).eval()
+                    self._loaded[pair] = (tokenizer, model)
+        return self._loaded[pair]
+
+    def _generate(self, texts: List[str], source: str, target: str) -> List[str]:
+        """Translate uncached texts, shortest first so each batch pads little"""
+        import torch
+
+        tokenizer, model = self._get_model(source, target)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        outputs: List[Optional[str]] = [None] * len(texts)
+
+        start = time.perf_counter()
+        with torch.inference_mode():
+            for batch_start in range(0, len(order), self.batch_size):
+                batch = order[batch_start:batch_start + self.batch_size]
+                inputs = tokenizer([texts[i] for i in batch], return_tensors="pt",
+                                   padding=True, truncation=True,
+                                   max_length=self.max_length).to(self.device)
+                generated = model.generate(**inputs, max_length=self.max_length)
+                for i, text in zip(batch, tokenizer.batch_decode(generated, skip_special_tokens=True)):
+                    outputs[i] = text
+        self.seconds += time.perf_counter() - start
+        self.sentences_translated += len(texts)
+        return outputs
+
+    def translate_batch(self, texts: List[str], source: str, target: str,
+                        cache: Optional[TTLCache] = None) -> List[str]:
+        """
+        Translate many texts with one batched model call for all cache misses
+
+        Args:
+            texts: Texts to translate
+            source: Source language code
+            target: Target language code
+            cache: Cache to use (defaults to the sentence cache)
+        """
+        if source == target or not texts:
+            return list(texts)
+        cache = cache or self.sentence_cache
+
+        results: List[Optional[str]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            if not text.strip():
+                results[i] = text
+                continue
+            cached = cache.get((source, target, text))
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing.setdefault(text, []).append(i)
+
+        if missing:
+            unique = list(missing)
+            for text, translated in zip(unique, self._generate(unique, source, target)):
+                cache.put((source, target, text), translated)
+                for i in missing[text]:
+                    results[i] = translated
+        return results
+
+    def translate_query(self, query: str, source: str) -> str:
+        """Translate a farmer's question to English"""
+        return self.translate_batch([query], source, "en", cache=self.query_cache)[0]
+
+    def translate_answer(self, answer: str, target: str) -> str:
+        """
+        Translate an English answer sentence by sentence
+
+        All sentences go through one batched forward pass, and sentences seen
+        in earlier answers come straight from the cache.
+        """
+        if target == "en" or not answer:
+            return answer
+        pieces = split_sentences(answer)
+        translated = self.translate_batch([body for body, _ in pieces], "en", target)
+        return "".join(text + sep for text, (_, sep) in zip(translated, pieces)).strip()
+
+    def warm_up(self, pairs: Optional[Iterable[Tuple[str, str]]] = None):
+        """
+        Load the translation models and run one tiny translation each, so the
+        first farmer request does not pay model loading and first-call costs
+        (call from the app's startup hook)
+        """
+        for source, target in pairs or self.models:
+            start = time.perf_counter()
+            self._generate(["ok" if source == "en" else "नमस्ते"], source, target)
+            print(f"✅ Translator {source}->{target} ready in {time.perf_counter() - start:.1f}s")
+
+    def stats(self) -> Dict:
+        """Cache hit rates and model throughput, for the /info endpoint"""
+        return {
+            "loaded_pairs": [f"{s}->{t}" for s, t in self._loaded],
+            "query_cache": self.query_cache.stats(),
+            "sentence_cache": self.sentence_cache.stats(),
+            "sentences_translated": self.sentences_translated,
+            "sentences_per_second": (self.sentences_translated / self.seconds
+                                     if self.seconds else 0.0)
+        }
+
+
+# Usage Example
+if __name__ == "__main__":
+    translator = BloomWatchTranslator()
+    translator.warm_up([("hi", "en"), ("en", "hi")])
+
+    query = translator.translate_query("मेरी मिट्टी के लिए कौन सी फसल सबसे अच्छी है?", "hi")
+    print(f"Query: {query}")
+
+    answer = ("Cotton and soybean grow well in black soil. "
+              "Apply 19:19:19 NPK at sowing.\nIrrigate every 10-12 days.")
+    for _ in range(2):
+        start = time.perf_counter()
+        print(translator.translate_answer(answer, "hi"))
+        print(f"⏱️  {time.perf_counter() - start:.3f}s")
+
+    print(translator.stats())
@@ -0,0 +1,363 @@
+"""
+prediction_store.py
+Columnar, tile-indexed store for the Colab prediction CSVs
+Each CSV is converted once into per-column .npy files sorted by tile_id,
+with a tile_id -> row range index, so a per-tile request is a slice of
+memory-mapped arrays instead of a pandas filter over the whole file
+
+Several server processes may share one store folder. New CSVs should be
+dropped into the data folder with an atomic rename (write to a temporary
+name, then rename, as the notebook's ForecastWriter does); the auto-reload
+watcher also waits for a file to stop changing before building from it.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Table name -> source file in the data folder (see README "Outputs Generated");
+# a Parquet file with the same name as a CSV takes its place
+TABLES = {
+    "tiles": "tile_master.csv",
+    "bloom": "bloom_predictions.csv",
+    "crop": "crop_predictions.csv",
+    "forecast": "future_predictions_6months_dynamic_prob.csv",
+    "forecast_bands": "future_predictions_6months_bands.parquet"
+}
+
+STORE_VERSION = 1
+
+
+def _fingerprint(paths: List[Path]) -> str:
+    """Changes whenever a source CSV is added, removed or rewritten"""
+    parts = []
+    for path in sorted(paths):
+        stat = path.stat()
+        parts.append(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class TileTable:
+    """
+    One prediction table: a memory-mapped array per column, rows grouped by tile
+
+    Layout of a table folder:
+        schema.json      - columns, kinds and row count
+        tile_index.json  - tile_id -> [start, end) row range
+        col_<i>.npy      - numeric column values
+        col_<i>.codes.npy + values in schema.json - dictionary-encoded text columns
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        with open(self.directory / "schema.json", "r", encoding="utf-8") as f:
+            self.schema = json.load(f)
+        with open(self.directory / "tile_index.json", "r", encoding="utf-8") as f:
+            self.tile_index: Dict[str, List[int]] = json.load(f)
+
+        self.columns: List[str] = [c["name"] for c in self.schema["columns"]]
+        self._arrays: List[np.ndarray] = []
+        self._values: List[Optional[List]] = []
+        for i, column in enumerate(self.schema["columns"]):
+            if column["kind"] == "text":
+                self._arrays.append(np.load(self.directory / f"col_{i}.codes.npy", mmap_mode="r"))
+                self._values.append(column["values"])
+            else:
+                self._arrays.append(np.load(self.directory / f"col_{i}.npy", mmap_mode="r"))
+                self._values.append(None)
+
+    def __len__(self) -> int:
+        return self.schema["rows"]
+
+    @classmethod
+    def build(cls, source_path: Path, directory: Path, tile_column: str = "tile_id") -> "TileTable":
+        """
+        Convert one CSV (or Parquet file) into a table folder
+
+        Rows are stably sorted by tile_id, so each tile's rows keep their
+        CSV order (e.g. forecast dates) and form one contiguous range.
+        """
+        df = pd.read_parquet(source_path) if source_path.suffix == ".parquet" else pd.read_csv(source_path)
+        if tile_column not in df.columns:
+            raise ValueError(f"{source_path.name} has no '{tile_column}' column")
+        df = df.sort_values(tile_column, kind="stable").reset_index(drop=True)
+        directory.mkdir(parents=True)
+
+        columns = []
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+                np.save(directory / f"col_{i}.npy", series.to_numpy())
+                columns.append({"name": name, "kind": "numeric", "dtype": str(series.dtype)})
+            else:
+                codes, values = pd.factorize(series.astype("string"), use_na_sentinel=True)
+                np.save(directory / f"col_{i}.codes.npy", codes.astype(np.int32))
+                columns.append({"name": name, "kind": "text", "values": [str(v) for v in values]})
+
+        tiles = df[tile_column].astype(str).to_numpy()
+        starts = np.flatnonzero(np.r_[True, tiles[1:] != tiles[:-1]])
+        ends = np.r_[starts[1:], len(tiles)]
+        tile_index = {tiles[s]: [int(s), int(e)] for s, e in zip(starts, ends)}
+
+        with open(directory / "tile_index.json", "w", encoding="utf-8") as f:
+            json.dump(tile_index, f)
+        with open(directory / "schema.json", "w", encoding="utf-8") as f:
+            json.dump({"source": source_path.name, "rows": int(len(df)), "tile_column": tile_column,
+                       "columns": columns}, f, indent=2)
+        return cls(directory)
+
+    def _column_slice(self, i: int, rows: slice) -> List:
+        values = self._values[i]
+        chunk = self._arrays[i][rows]
+        if values is None:
+            return [None if isinstance(v, float) and v != v else v for v in chunk.tolist()]
+        return [values[code] if code >= 0 else None for code in chunk.tolist()]
+
+    def rows_for(self, tile_id: str) -> Optional[slice]:
+        span = self.tile_index.get(tile_id)
+        return slice(span[0], span[1]) if span else None
+
+    def records(self, tile_id: Optional[str] = None) -> List[Dict]:
+        """
+        JSON-ready rows of one tile (or the whole table when tile_id is None)
+
+        Returns:
+            [] when the tile is unknown
+        """
+        rows = slice(0, len(self)) if tile_id is None else self.rows_for(tile_id)
+        if rows is None:
+            return []
+        columns = [self._column_slice(i, rows) for i in range(len(self.columns))]
+        return [dict(zip(self.columns, values)) for values in zip(*columns)]
+
+    def column(self, name: str, tile_id: Optional[str] = None) -> List:
+        """One column for one tile (or the whole table)"""
+        rows = slice(0, len(self)) if tile_id is None else self.rows_for(tile_id)
+        if rows is None:
+            return []
+        return self._column_slice(self.columns.index(name), rows)
+
+
+class PredictionStore:
+    """
+    All prediction tables, rebuilt from the CSVs and swapped in atomically
+    whenever the CSVs change
+    """
+
+    def __init__(self, data_dir: str = "./data", store_dir: Optional[str] = None):
+        """
+        Initialize the store (call load() or reload_if_changed() before use)
+
+        Args:
+            data_dir: Folder with the Colab CSV outputs
+            store_dir: Folder for the columnar store (default <data_dir>/store)
+        """
+        self.data_dir = Path(data_dir)
+        self.store_dir = Path(store_dir) if store_dir else self.data_dir / "store"
+        self.tables: Dict[str, TileTable] = {}
+        self.version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._pending: Optional[str] = None
+
+    def _sources(self) -> Dict[str, Path]:
+        """Source file per table - the notebook's Parquet output when present, else the CSV"""
+        sources = {}
+        for name, csv_name in TABLES.items():
+            for path in (self.data_dir / Path(csv_name).with_suffix(".parquet").name, self.data_dir / csv_name):
+                if path.exists():
+                    sources[name] = path
+                    break
+        return sources
+
+    def current_fingerprint(self) -> str:
+        return f"v{STORE_VERSION}-{_fingerprint(list(self._sources().values()))}"
+
+    def build(self) -> str:
+        """
+        Convert every available CSV into a new store version
+
+        The version folder is written under a per-process temporary name and
+        renamed into place, so a crash mid-build never leaves a half-written
+        version, and processes building the same version at once don't
+        collide - the first rename wins and the others discard their copy.
+
+        Returns:
+            The version name
+        """
+        version = self.current_fingerprint()
+        target = self.store_dir / version
+        if (target / "COMPLETE").exists():
+            return version
+
+        tmp = self.store_dir / f".{version}.{os.getpid()}.tmp"
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+        start = time.perf_counter()
+        try:
+            for name, source_path in self._sources().items():
+                table = TileTable.build(source_path, tmp / name)
+                print(f"📦 {source_path.name}: {len(table)} rows, {len(table.tile_index)} tiles")
+            (tmp / "COMPLETE").touch()
+            if target.exists() and not (target / "COMPLETE").exists():
+                # Left behind by an older store layout, never by a rename
+                shutil.rmtree(target, ignore_errors=True)
+            try:
+                os.replace(tmp, target)
+            except OSError:
+                if not (target / "COMPLETE").exists():
+                    raise
+                print(f"♻️  Prediction store {version} was built by another process")
+                return version
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        print(f"✅ Prediction store {version} built in {time.perf_counter() - start:.2f}s")
+        return version
+
+    def _built_at(self, version: Optional[str]) -> Optional[int]:
+        """When a version finished building (None if it is not on disk)"""
+        try:
+            return (self.store_dir / version / "COMPLETE").stat().st_mtime_ns if version else None
+        except FileNotFoundError:
+            return None
+
+    def _activate(self, version: str):
+        directory = self.store_dir / version
+        tables = {name: TileTable(directory / name) for name in TABLES
+                  if (directory / name / "schema.json").exists()}
+        previous = self.version
+        # A single reference swap - requests see either the old or the new tables
+        self.tables = tables
+        self.version = version
+
+        # Point CURRENT at the newest version any process has activated
+        pointer = self.store_dir / "CURRENT"
+        current = pointer.read_text(encoding="utf-8").strip() if pointer.exists() else None
+        current_built_at = self._built_at(current)
+        built_at = self._built_at(version)
+        if current_built_at is None or built_at >= current_built_at:
+            tmp_pointer = self.store_dir / f"CURRENT.{os.getpid()}.tmp"
+            tmp_pointer.write_text(version, encoding="utf-8")
+            os.replace(tmp_pointer, pointer)
+            current, current_built_at = version, built_at
+
+        # Drop only versions older than CURRENT - other processes may still be
+        # opening anything newer (open memory maps keep their files alive)
+        for old in self.store_dir.iterdir():
+            if not old.is_dir() or old.name in (current, version, previous) or old.name.startswith("."):
+                continue
+            old_built_at = self._built_at(old.name)
+            if old_built_at is not None and old_built_at < current_built_at:
+                shutil.rmtree(old, ignore_errors=True)
+
+    def load(self) -> "PredictionStore":
+        """Open the current version, building it first if the CSVs changed"""
+        self.reload_if_changed()
+        return self
+
+    def reload_if_changed(self, require_stable: bool = False) -> bool:
+        """
+        Rebuild and swap in a new version when the CSVs changed
+
+        Args:
+            require_stable: Only build once the same change has been seen on two
+                            calls in a row, so a CSV that is still being copied
+                            in is not served truncated (used by the watcher)
+
+        Returns:
+            True if a new version was activated
+        """
+        with self._lock:
+            version = self.current_fingerprint()
+            if version == self.version:
+                self._pending = None
+                return False
+            if require_stable and version != self._pending:
+                self._pending = version
+                return False
+            self._pending = None
+            version = self.build()
+            self._activate(version)
+            print(f"🔄 Prediction store now serving {version}")
+            return True
+
+    def start_auto_reload(self, interval_seconds: float = 30.0):
+        """
+        Poll the data folder in the background and reload when new CSVs arrive
+        (a change is picked up once it has been stable for one interval)
+        """
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    self.reload_if_changed(require_stable=True)
+                except Exception as e:
+                    print(f"❌ Prediction store reload failed, still serving {self.version}: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="prediction-store-reload", daemon=True)
+        self._watcher.start()
+
+    def table(self, name: str) -> TileTable:
+        tables = self.tables
+        if name not in tables:
+            raise KeyError(f"No '{name}' table - is {TABLES.get(name, name)} in {self.data_dir}?")
+        return tables[name]
+
+    def get(self, name: str, tile_id: str) -> List[Dict]:
+        """Rows of one table for one tile ([] when the tile is unknown)"""
+        return self.table(name).records(tile_id)
+
+    def tile_ids(self) -> List[str]:
+        tables = self.tables
+        ids = set()
+        for table in tables.values():
+            ids.update(table.tile_index)
+        return sorted(ids)
+
+
+# Usage Example
+if __name__ == "__main__":
+    import sys
+
+    store = PredictionStore(sys.argv[1] if len(sys.argv) > 1 else "./data").load()
+    print(f"Tables: {', '.join(store.tables)}")
+
+    if "forecast" in store.tables:
+        tile_id = store.tile_ids()[0]
+        requests = 1000
+        start = time.perf_counter()
+        for _ in range(requests):
+            rows = store.get("forecast", tile_id)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / requests
+        print(f"⏱️  /predict/forecast/{tile_id}: {len(rows)} rows in {elapsed_ms:.3f} ms per request")
+
+# FastAPI wiring (backend/main.py)
+#
+# store = PredictionStore("./data").load()
+# store.start_auto_reload(interval_seconds=30)
+#
+# @app.get("/predict/bloom/{tile_id}")
+# def predict_bloom(tile_id: str):
+#     rows = store.get("bloom", tile_id)
+#     if not rows:
+#         raise HTTPException(status_code=404, detail=f"Unknown tile {tile_id}")
+#     return rows[0]
+#
+# @app.get("/predict/forecast/{tile_id}")
+# def predict_forecast(tile_id: str):
+#     # Monte-Carlo mean and P10 / P50 / P90 per day when the band table is there
+#     if "forecast_bands" in store.tables:
+#         return store.get("forecast_bands", tile_id)
+#     return store.get("forecast", tile_id)
@@ -0,0 +1,206 @@
+"""
+spatial_index.py
+Tile lookups for the prediction grid
+Point -> tile by grid arithmetic, rectangle / polygon -> overlapping tiles
+(with area fractions) through a shapely STR-tree over the tile boxes
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import shapely
+from shapely.geometry import box
+
+# Nashik region and tile size used by the notebook's create_tiles
+NASHIK_REGION = (73.6, 19.8, 74.0, 20.2)   # lon_min, lat_min, lon_max, lat_max
+TILE_SIZE_DEG = 0.05
+
+# Grid extents within this many tile widths of a whole number are not
+# given an extra sliver column/row by floating-point noise
+_GRID_EPS = 1e-9
+
+
+class TileGrid:
+    """
+    Regular lon/lat grid with the notebook's tile_{ix}_{jx} ids
+    (ix counts columns west -> east, jx counts rows south -> north;
+    the last column/row is clipped to the region)
+    """
+
+    def __init__(self, lon_min: float, lat_min: float, lon_max: float, lat_max: float,
+                 tile_size_deg: float = TILE_SIZE_DEG):
+        self.lon_min, self.lat_min = lon_min, lat_min
+        self.lon_max, self.lat_max = lon_max, lat_max
+        self.tile_size = tile_size_deg
+        self.nx = max(1, math.ceil((lon_max - lon_min) / tile_size_deg - _GRID_EPS))
+        self.ny = max(1, math.ceil((lat_max - lat_min) / tile_size_deg - _GRID_EPS))
+
+    def __len__(self) -> int:
+        return self.nx * self.ny
+
+    def edges(self):
+        """Column and row edges, computed from integer indices (no accumulated drift)"""
+        lon_edges = np.minimum(self.lon_min + np.arange(self.nx + 1) * self.tile_size, self.lon_max)
+        lat_edges = np.minimum(self.lat_min + np.arange(self.ny + 1) * self.tile_size, self.lat_max)
+        lon_edges[-1], lat_edges[-1] = self.lon_max, self.lat_max
+        return lon_edges, lat_edges
+
+    def bounds(self) -> np.ndarray:
+        """(nx * ny, 4) lon_min, lat_min, lon_max, lat_max per tile, ix-major order"""
+        lon_edges, lat_edges = self.edges()
+        ix, jx = np.meshgrid(np.arange(self.nx), np.arange(self.ny), indexing="ij")
+        ix, jx = ix.ravel(), jx.ravel()
+        return np.column_stack([lon_edges[ix], lat_edges[jx], lon_edges[ix + 1], lat_edges[jx + 1]])
+
+    def tile_ids(self) -> np.ndarray:
+        ix, jx = np.meshgrid(np.arange(self.nx), np.arange(self.ny), indexing="ij")
+        return np.char.add(np.char.add(np.char.add("tile_", ix.ravel().astype(str)), "_"),
+                           jx.ravel().astype(str))
+
+    def cell(self, lats, lons):
+        """
+        Grid cell(s) containing the point(s)
+
+        Returns:
+            (ix, jx) integer arrays, -1 where a point is outside the grid
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        ix = np.floor((lons - self.lon_min) / self.tile_size).astype(np.int64)
+        jx = np.floor((lats - self.lat_min) / self.tile_size).astype(np.int64)
+        # Points on the region's far edge belong to the last tile
+        ix = np.minimum(ix, self.nx - 1)
+        jx = np.minimum(jx, self.ny - 1)
+        inside = ((lons >= self.lon_min) & (lons <= self.lon_max)
+                  & (lats >= self.lat_min) & (lats <= self.lat_max))
+        return np.where(inside, ix, -1), np.where(inside, jx, -1)
+
+
+class TileSpatialIndex:
+    """
+    Spatial index over tile rectangles
+
+    Built from a TileGrid (point lookups by arithmetic) or from arbitrary
+    tile bounds such as the lon/lat columns of tile_master.csv (point
+    lookups through the STR-tree).
+    """
+
+    def __init__(self, tile_ids: Sequence[str], bounds: np.ndarray,
+                 grid: Optional[TileGrid] = None):
+        """
+        Args:
+            tile_ids: Tile id per row of bounds
+            bounds: (n, 4) lon_min, lat_min, lon_max, lat_max
+            grid: The grid the tiles come from, if they form one
+        """
+        self.tile_ids = np.asarray(tile_ids)
+        self.bounds = np.asarray(bounds, dtype=np.float64)
+        self.grid = grid
+        self.areas = (self.bounds[:, 2] - self.bounds[:, 0]) * (self.bounds[:, 3] - self.bounds[:, 1])
+        self.geometries = shapely.box(self.bounds[:, 0], self.bounds[:, 1],
+                                      self.bounds[:, 2], self.bounds[:, 3])
+        self.tree = shapely.STRtree(self.geometries)
+        self._position = {tile_id: i for i, tile_id in enumerate(self.tile_ids.tolist())}
+
+    @classmethod
+    def from_grid(cls, grid: TileGrid) -> "TileSpatialIndex":
+        return cls(grid.tile_ids(), grid.bounds(), grid=grid)
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> "TileSpatialIndex":
+        """From rows with tile_id, lon_min, lat_min, lon_max, lat_max (e.g. tile_master)"""
+        return cls([r["tile_id"] for r in records],
+                   np.array([[r["lon_min"], r["lat_min"], r["lon_max"], r["lat_max"]]
+                             for r in records], dtype=np.float64))
+
+    def __len__(self) -> int:
+        return len(self.tile_ids)
+
+    def tile_bounds(self, tile_id: str) -> Optional[Dict]:
+        i = self._position.get(tile_id)
+        if i is None:
+            return None
+        lon_min, lat_min, lon_max, lat_max = self.bounds[i].tolist()
+        return {"lon_min": lon_min, "lat_min": lat_min, "lon_max": lon_max, "lat_max": lat_max}
+
+    def tile_at(self, lat: float, lon: float) -> Optional[str]:
+        """Tile containing a point (None outside the tiles)"""
+        if self.grid is not None:
+            ix, jx = self.grid.cell(lat, lon)
+            if ix < 0:
+                return None
+            return str(self.tile_ids[int(ix) * self.grid.ny + int(jx)])
+        hits = self.tree.query(shapely.points(lon, lat), predicate="intersects")
+        return str(self.tile_ids[hits.min()]) if len(hits) else None
+
+    def tiles_at(self, lats: Sequence[float], lons: Sequence[float]) -> List[Optional[str]]:
+        """Vectorized tile_at for many points"""
+        if self.grid is None:
+            return [self.tile_at(lat, lon) for lat, lon in zip(lats, lons)]
+        ix, jx = self.grid.cell(lats, lons)
+        positions = ix * self.grid.ny + jx
+        return [str(self.tile_ids[p]) if i >= 0 else None for i, p in zip(ix.tolist(), positions.tolist())]
+
+    def tiles_in_bbox(self, lat_1: float, lat_2: float, lon_1: float, lon_2: float) -> List[Dict]:
+        """
+        Tiles overlapping a rectangle, e.g. the frontend's addRegion corners
+        (lat_1/lat_2/lan_1/lan_2, in any order)
+
+        Returns:
+            [{tile_id, tile_fraction, region_fraction}], largest overlap first;
+            tile_fraction is the share of the tile inside the rectangle,
+            region_fraction the share of the rectangle covered by the tile
+        """
+        lon_min, lon_max = sorted((float(lon_1), float(lon_2)))
+        lat_min, lat_max = sorted((float(lat_1), float(lat_2)))
+        candidates = self.tree.query(box(lon_min, lat_min, lon_max, lat_max))
+        if not len(candidates):
+            return []
+
+        # Rectangle / rectangle overlap needs no polygon clipping
+        b = self.bounds[candidates]
+        width = np.clip(np.minimum(b[:, 2], lon_max) - np.maximum(b[:, 0], lon_min), 0, None)
+        height = np.clip(np.minimum(b[:, 3], lat_max) - np.maximum(b[:, 1], lat_min), 0, None)
+        overlap = width * height
+        region_area = (lon_max - lon_min) * (lat_max - lat_min)
+        return self._overlaps(candidates, overlap, region_area)
+
+    def tiles_in_geometry(self, geometry) -> List[Dict]:
+        """Tiles overlapping any shapely geometry (e.g. a drawn polygon), with area fractions"""
+        candidates = self.tree.query(geometry, predicate="intersects")
+        if not len(candidates):
+            return []
+        overlap = shapely.area(shapely.intersection(self.geometries[candidates], geometry))
+        return self._overlaps(candidates, overlap, geometry.area)
+
+    def _overlaps(self, candidates: np.ndarray, overlap: np.ndarray, region_area: float) -> List[Dict]:
+        keep = overlap > 0
+        candidates, overlap = candidates[keep], overlap[keep]
+        order = np.argsort(-overlap, kind="stable")
+        return [{
+            "tile_id": str(self.tile_ids[candidates[i]]),
+            "tile_fraction": round(float(overlap[i] / self.areas[candidates[i]]), 6),
+            "region_fraction": round(float(overlap[i] / region_area), 6) if region_area > 0 else 0.0
+        } for i in order]
+
+
+# Usage Example
+if __name__ == "__main__":
+    import time
+
+    index = TileSpatialIndex.from_grid(TileGrid(*NASHIK_REGION))
+    print(f"✅ {len(index)} Nashik tiles")
+    print(f"📍 (20.01, 73.77) -> {index.tile_at(20.01, 73.77)}")
+    print(f"🗺️  Region -> {index.tiles_in_bbox(19.97, 20.03, 73.74, 73.81)[:4]}")
+
+    # A 0.01 degree grid over Maharashtra
+    start = time.perf_counter()
+    state = TileSpatialIndex.from_grid(TileGrid(72.6, 15.6, 80.9, 22.1, 0.01))
+    print(f"\n⏱️  {len(state):,} Maharashtra tiles indexed in {time.perf_counter() - start:.2f}s")
+    queries = 1000
+    start = time.perf_counter()
+    for _ in range(queries):
+        overlaps = state.tiles_in_bbox(19.97, 20.13, 73.74, 73.91)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / queries
+    print(f"⏱️  bbox query over {len(overlaps)} tiles: {elapsed_ms:.3f} ms")